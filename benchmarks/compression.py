@@ -0,0 +1,97 @@
+"""Compare the compression codecs and levels a dataset can be written with.
+
+The dataset is rewritten by the shared write stage (sorted by `cluster_by`, in
+row groups of `row_group_size` rows) once per candidate, and for each one the
+file size, the write time, the time to scan the whole file and the time of a
+selective scan (filtered by the first `cluster_by` column) are reported. The
+candidate marked with `*` is the one the dataset currently uses.
+
+Smaller files favour disk or network bound deployments, faster scans CPU bound
+ones: set `compression` and `compression_level` in the dataset class accordingly.
+
+Usage:
+    python benchmarks/compression.py [--dataset sinpatinhas] [--runs 5]
+        [--candidates zstd:1 zstd zstd:9 zstd:19 lz4 snappy uncompressed]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from cacimbao.datasets import get_dataset
+from cacimbao.helpers import write_parquet
+from cacimbao.loaders import _resolve_filepath
+
+# "zstd" is zstd with its default level (3)
+CANDIDATES = ["zstd:1", "zstd", "zstd:9", "zstd:19", "lz4", "snappy", "uncompressed"]
+
+
+def parse_candidate(candidate: str) -> tuple[str, int | None]:
+    compression, _, level = candidate.partition(":")
+    return compression, int(level) if level else None
+
+
+def median_ms(function, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default="sinpatinhas")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--candidates", nargs="+", default=CANDIDATES)
+    args = parser.parse_args()
+
+    dataset = get_dataset(args.dataset)
+    df = pl.read_parquet(_resolve_filepath(args.dataset))
+    predicate = None
+    if dataset.cluster_by:
+        key = dataset.cluster_by[0]
+        value = df.group_by(key).len().sort("len").row(-1, named=True)[key]
+        predicate = pl.col(key) == value
+    current = (dataset.compression, dataset.compression_level)
+
+    print(f"{args.dataset}: {df.height} linhas, mediana de {args.runs} execuções")
+    print(
+        f"  {'codec':<16}{'tamanho':>12}{'escrita':>12}{'leitura':>12}{'seletiva':>12}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for candidate in args.candidates:
+            compression, level = parse_candidate(candidate)
+            path = Path(tmp_dir) / f"{candidate.replace(':', '-')}.parquet"
+
+            def write():
+                write_parquet(
+                    df,
+                    str(path),
+                    sort_by=dataset.cluster_by,
+                    row_group_size=dataset.row_group_size,
+                    compression=compression,
+                    compression_level=level,
+                )
+
+            write_ms = median_ms(write, args.runs)
+            scan_ms = median_ms(pl.scan_parquet(path).collect, args.runs)
+            selective = "-"
+            if predicate is not None:
+                query = pl.scan_parquet(path).filter(predicate)
+                selective = f"{median_ms(query.collect, args.runs):.1f} ms"
+            marker = "*" if (compression, level) == current else " "
+            print(
+                f"{marker} {candidate:<16}"
+                f"{path.stat().st_size / 1024**2:>8.2f} MiB"
+                f"{write_ms:>9.1f} ms{scan_ms:>9.1f} ms{selective:>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Measure the time taken by `import cacimbao` in a fresh interpreter.
+
+Usage:
+    python benchmarks/import_time.py [--runs 10] [--max-ms 100]
+
+With `--max-ms`, the script exits with an error if the median import time is
+above the limit, so it can be used to catch import time regressions.
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+
+def import_time_us() -> int:
+    """Return the cumulative import time of cacimbao, in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import cacimbao"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    match = re.search(r"\|\s+(\d+) \| cacimbao$", result.stderr, re.MULTILINE)
+    return int(match.group(1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    import_time_us()  # warm up the filesystem cache
+    timings_ms = [import_time_us() / 1000 for _ in range(args.runs)]
+    median_ms = statistics.median(timings_ms)
+    print(
+        f"import cacimbao: median {median_ms:.1f} ms "
+        f"(min {min(timings_ms):.1f} ms, max {max(timings_ms):.1f} ms, "
+        f"{args.runs} runs)"
+    )
+    if args.max_ms is not None and median_ms > args.max_ms:
+        sys.exit(f"Import time above the limit of {args.max_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare selective scans of a dataset written with and without clustering.
+
+"Before" is the dataset written in its original (arbitrary) row order with the
+default polars settings, as the `prepare` methods used to do. "After" is the
+same data written by the shared write stage (`BaseDataset.write`): sorted by
+the dataset `cluster_by` columns, in row groups of `row_group_size` rows and
+with column statistics.
+
+Usage:
+    python benchmarks/selective_scan.py [--dataset sinpatinhas] [--runs 10]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from cacimbao.datasets import get_dataset
+from cacimbao.helpers import write_parquet
+from cacimbao.loaders import _resolve_filepath
+from cacimbao.parquet import parquet_footer_stats
+
+
+def median_ms(query: pl.LazyFrame, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        query.collect()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default="sinpatinhas")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    dataset = get_dataset(args.dataset)
+    if not dataset.cluster_by:
+        raise SystemExit(f"A base de dados '{args.dataset}' não define cluster_by.")
+    # shuffled, as the rows come from the original sources
+    df = pl.read_parquet(_resolve_filepath(args.dataset)).sample(
+        fraction=1, shuffle=True, seed=0
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        before = Path(tmp_dir) / "before.parquet"
+        after = Path(tmp_dir) / "after.parquet"
+        df.write_parquet(before)
+        write_parquet(
+            df,
+            str(after),
+            sort_by=dataset.cluster_by,
+            row_group_size=dataset.row_group_size,
+        )
+
+        # a frequent value of each cluster key, combined in growing filters
+        row = df.group_by(dataset.cluster_by).len().sort("len").row(-1, named=True)
+        print(f"{args.dataset}: {df.height} linhas, mediana de {args.runs} execuções")
+        for path in (before, after):
+            footer = parquet_footer_stats(path)
+            print(
+                f"  {path.stem}: {path.stat().st_size / 1024**2:.1f} MiB, "
+                f"{footer['row_groups']} row groups"
+            )
+        for size in range(1, len(dataset.cluster_by) + 1):
+            keys = dataset.cluster_by[:size]
+            predicate = pl.all_horizontal([pl.col(key) == row[key] for key in keys])
+            timings = [
+                median_ms(pl.scan_parquet(path).filter(predicate), args.runs)
+                for path in (before, after)
+            ]
+            print(
+                f"  filtro {' + '.join(keys)}: "
+                f"{timings[0]:.1f} ms -> {timings[1]:.1f} ms "
+                f"({timings[0] / timings[1]:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
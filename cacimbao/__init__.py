@@ -1,4 +1,49 @@
+from cacimbao.cache import (
+    cache_info,
+    cache_prune,
+    clear_memory_cache,
+    disable_memory_cache,
+    enable_memory_cache,
+    get_cache_dir,
+    memory_cache_info,
+    set_cache_dir,
+    set_cache_max_size,
+)
 from cacimbao.datasets import list_datasets
-from cacimbao.loaders import download_dataset, load_dataset
+from cacimbao.loaders import (
+    adownload_dataset,
+    aload_dataset,
+    dataset_stats,
+    datasets_manifest,
+    download_dataset,
+    download_datasets,
+    iter_batches,
+    load_dataset,
+    scan_dataset,
+    verify_dataset,
+    verify_datasets,
+)
 
-__all__ = ["download_dataset", "list_datasets", "load_dataset"]
+__all__ = [
+    "adownload_dataset",
+    "aload_dataset",
+    "cache_info",
+    "cache_prune",
+    "clear_memory_cache",
+    "dataset_stats",
+    "datasets_manifest",
+    "disable_memory_cache",
+    "download_dataset",
+    "download_datasets",
+    "enable_memory_cache",
+    "get_cache_dir",
+    "iter_batches",
+    "list_datasets",
+    "load_dataset",
+    "memory_cache_info",
+    "scan_dataset",
+    "set_cache_dir",
+    "set_cache_max_size",
+    "verify_dataset",
+    "verify_datasets",
+]
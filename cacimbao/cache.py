@@ -0,0 +1,458 @@
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from cacimbao.helpers import data_files, data_size
+
+DATASETS_DIR = Path.home() / "cacimbao"  # default cache directory
+CACHE_DIR_ENV_VAR = "CACIMBAO_CACHE_DIR"
+CACHE_MAX_SIZE_ENV_VAR = "CACIMBAO_CACHE_MAX_SIZE"
+MANIFEST_FILENAME = "manifest.json"
+STATS_FILENAME = "stats.json"
+# the last access is written at most once per interval, to avoid a manifest
+# write on every load
+ACCESS_UPDATE_INTERVAL = timedelta(minutes=1)
+
+_manifest_lock = threading.Lock()
+_cache_dir: Path | None = None
+_cache_max_size: int | None = None
+
+
+def set_cache_dir(path: str | Path | None):
+    """
+    Set the directory where the remote datasets are stored.
+
+    Args:
+        path: Cache directory. If None, the `CACIMBAO_CACHE_DIR` environment
+            variable or the default `~/cacimbao` is used.
+    """
+    global _cache_dir
+    _cache_dir = Path(path).expanduser() if path is not None else None
+
+
+def get_cache_dir() -> Path:
+    """Return the directory where the remote datasets are stored."""
+    if _cache_dir is not None:
+        return _cache_dir
+    if os.environ.get(CACHE_DIR_ENV_VAR):
+        return Path(os.environ[CACHE_DIR_ENV_VAR]).expanduser()
+    return DATASETS_DIR
+
+
+def _parse_size(size: str) -> int:
+    """Parse sizes like `1048576`, `500M` or `20GB` into bytes."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", size, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Tamanho inválido: '{size}'. Use, por exemplo, 500M ou 20G.")
+    number, unit = match.groups()
+    multipliers = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    return int(float(number) * multipliers[unit.upper()])
+
+
+def set_cache_max_size(max_size: int | str | None):
+    """
+    Set the maximum disk space used by the remote datasets.
+
+    When a download makes the cache exceed this size, the least recently used
+    datasets are removed (see `cache_prune`).
+
+    Args:
+        max_size: Size in bytes (or a string like "20G"). If None, the
+            `CACIMBAO_CACHE_MAX_SIZE` environment variable is used, if set;
+            otherwise the cache size is unlimited.
+    """
+    global _cache_max_size
+    if isinstance(max_size, str):
+        max_size = _parse_size(max_size)
+    _cache_max_size = max_size
+
+
+def get_cache_max_size() -> int | None:
+    """Return the maximum disk space used by the remote datasets, if any."""
+    if _cache_max_size is not None:
+        return _cache_max_size
+    if os.environ.get(CACHE_MAX_SIZE_ENV_VAR):
+        return _parse_size(os.environ[CACHE_MAX_SIZE_ENV_VAR])
+    return None
+
+
+@contextmanager
+def file_lock(lock_path: Path, blocking: bool = True):
+    """
+    Hold an exclusive lock on a file, shared by all the processes of the host.
+
+    Several processes (e.g. API workers) can share a cache directory: the
+    lock serializes their downloads of a dataset and their updates of the
+    manifest. The lock is advisory (`flock`) and is released when the block
+    exits or the process dies. Where `fcntl` is not available (Windows), only
+    the locks between threads apply.
+
+    Args:
+        lock_path: Path of the lock file (created if needed, never removed)
+        blocking: If False, raise `BlockingIOError` instead of waiting
+
+    Raises:
+        BlockingIOError: If `blocking` is False and the lock is held
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as f:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        fcntl.flock(f, flags)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _locked_json(path: Path):
+    """Serialize the read-modify-write of a json file, across threads and processes."""
+    with _manifest_lock, file_lock(path.with_name(f".{path.name}.lock")):
+        yield
+
+
+def dataset_lock_path(cache_dir: Path, name: str) -> Path:
+    """Return the path of the lock file held while a dataset is downloaded."""
+    return cache_dir / f".{name}.lock"
+
+
+def _load_json(path: Path) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(
+        json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8"
+    )
+    os.replace(tmp_path, path)  # atomic, readers never see half a file
+
+
+def load_manifest(cache_dir: Path) -> dict:
+    """
+    Load the manifest of the datasets downloaded to the cache directory.
+
+    Args:
+        cache_dir: Directory where the remote datasets are stored
+
+    Returns:
+        Dictionary with one entry per dataset name (empty if there is no manifest)
+    """
+    return _load_json(cache_dir / MANIFEST_FILENAME)
+
+
+def _save_manifest(cache_dir: Path, manifest: dict):
+    _save_json(cache_dir / MANIFEST_FILENAME, manifest)
+
+
+def get_entry(cache_dir: Path, name: str) -> dict | None:
+    """Return the manifest entry of a dataset, if any."""
+    return load_manifest(cache_dir).get(name)
+
+
+def update_entry(cache_dir: Path, name: str, **fields) -> dict:
+    """
+    Create or update the manifest entry of a dataset.
+
+    Args:
+        cache_dir: Directory where the remote datasets are stored
+        name: Name of the dataset
+        fields: Values to be stored in the entry (e.g. url, path, size, sha256)
+
+    Returns:
+        The updated entry
+    """
+    with _locked_json(cache_dir / MANIFEST_FILENAME):
+        manifest = load_manifest(cache_dir)
+        entry = manifest.get(name, {})
+        entry.update(fields)
+        entry["updated_at"] = datetime.now(timezone.utc).isoformat()
+        manifest[name] = entry
+        _save_manifest(cache_dir, manifest)
+    return entry
+
+
+def remove_entry(cache_dir: Path, name: str):
+    """Remove the manifest entry of a dataset."""
+    with _locked_json(cache_dir / MANIFEST_FILENAME):
+        manifest = load_manifest(cache_dir)
+        if manifest.pop(name, None) is not None:
+            _save_manifest(cache_dir, manifest)
+
+
+def touch_entry(cache_dir: Path, name: str):
+    """Record that a cached dataset was used (for least recently used pruning)."""
+    entry = get_entry(cache_dir, name)
+    if entry is None:
+        return
+    now = datetime.now(timezone.utc)
+    if "last_accessed" in entry:
+        last_accessed = datetime.fromisoformat(entry["last_accessed"])
+        if now - last_accessed < ACCESS_UPDATE_INTERVAL:
+            return
+    update_entry(cache_dir, name, last_accessed=now.isoformat())
+
+
+def _disk_usage(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def cache_info() -> list[dict]:
+    """
+    Report the remote datasets stored in the cache directory.
+
+    Returns:
+        List with the name, path, disk usage (in bytes), source URL and last
+        access of each cached dataset, from the most to the least recently used
+    """
+    cache_dir = get_cache_dir()
+    datasets = []
+    for name, entry in load_manifest(cache_dir).items():
+        dataset_dir = cache_dir / name
+        datasets.append(
+            {
+                "name": name,
+                "path": str(dataset_dir),
+                "size": _disk_usage(dataset_dir) if dataset_dir.exists() else 0,
+                "url": entry.get("url"),
+                "last_accessed": entry.get("last_accessed", entry.get("updated_at")),
+            }
+        )
+    return sorted(
+        datasets, key=lambda dataset: dataset["last_accessed"] or "", reverse=True
+    )
+
+
+def remove_dataset(cache_dir: Path, name: str):
+    """Remove a dataset (and any partial download of it) from the cache."""
+    shutil.rmtree(cache_dir / name, ignore_errors=True)
+    shutil.rmtree(cache_dir / f".{name}.download", ignore_errors=True)
+    for partial in cache_dir.glob(f".{name}.zip*"):
+        partial.unlink(missing_ok=True)
+    remove_entry(cache_dir, name)
+
+
+def cache_prune(max_size: int | str | None = None, keep: tuple = ()) -> list[str]:
+    """
+    Remove the least recently used datasets until the cache fits in `max_size`.
+
+    Args:
+        max_size: Maximum disk space (bytes or a string like "20G"). Defaults
+            to the configured maximum size (see `set_cache_max_size`).
+        keep: Names of datasets that must not be removed
+
+    Returns:
+        Names of the removed datasets
+    """
+    if isinstance(max_size, str):
+        max_size = _parse_size(max_size)
+    if max_size is None:
+        max_size = get_cache_max_size()
+    if max_size is None:
+        return []
+
+    cache_dir = get_cache_dir()
+    datasets = cache_info()
+    total_size = sum(dataset["size"] for dataset in datasets)
+    removed = []
+    for dataset in reversed(datasets):  # least recently used first
+        if total_size <= max_size:
+            break
+        if dataset["name"] in keep:
+            continue
+        try:
+            # datasets being downloaded (by any process) are not removed
+            with file_lock(dataset_lock_path(cache_dir, dataset["name"]), False):
+                remove_dataset(cache_dir, dataset["name"])
+        except BlockingIOError:
+            continue
+        total_size -= dataset["size"]
+        removed.append(dataset["name"])
+    return removed
+
+
+def cached_filepath(cache_dir: Path, name: str, url: str | None = None) -> Path | None:
+    """
+    Return the path of a cached dataset file if it can be used as is.
+
+    The cache is valid when the manifest has an entry for the dataset, the
+    data file exists with the recorded size and, if `url` is given, it was
+    downloaded from the same URL (i.e. the dataset version did not change).
+
+    Args:
+        cache_dir: Directory where the remote datasets are stored
+        name: Name of the dataset
+        url: Expected source URL of the dataset
+
+    Returns:
+        Path to the cached data file or None
+    """
+    entry = get_entry(cache_dir, name)
+    if not entry:
+        return None
+    if url is not None and entry.get("url") != url:
+        return None
+
+    file_path = cache_dir / name / entry["path"]
+    if not file_path.exists() or data_size(file_path) != entry.get("size"):
+        return None
+    return file_path
+
+
+def data_signature(path: Path) -> tuple[int, int]:
+    """
+    Return the last modification time and the size of a data file (or of all
+    files of a partitioned directory), which change with every new version.
+    """
+    stats = [file.stat() for file in data_files(path)]
+    return (
+        max((stat.st_mtime_ns for stat in stats), default=0),
+        sum(stat.st_size for stat in stats),
+    )
+
+
+def get_file_stats(cache_dir: Path, file_path: Path) -> dict | None:
+    """
+    Return the stored statistics of a data file, if they are up to date.
+
+    Statistics are keyed by the file path and only valid for the modification
+    time and size the file had when they were computed, so a new version of
+    the file (e.g. written by `prepare`) invalidates them.
+    """
+    stats = _load_json(cache_dir / STATS_FILENAME).get(str(file_path))
+    if stats is None:
+        return None
+    if (stats.get("mtime_ns"), stats.get("file_size")) != data_signature(file_path):
+        return None
+    return stats
+
+
+def save_file_stats(cache_dir: Path, file_path: Path, stats: dict):
+    """Store the statistics of a data file (see `get_file_stats`)."""
+    with _locked_json(cache_dir / STATS_FILENAME):
+        all_stats = _load_json(cache_dir / STATS_FILENAME)
+        # forget the statistics of files that no longer exist
+        all_stats = {
+            path: item for path, item in all_stats.items() if Path(path).exists()
+        }
+        all_stats[str(file_path)] = stats
+        _save_json(cache_dir / STATS_FILENAME, all_stats)
+
+
+def frame_size(frame) -> int:
+    """Estimate the memory used by a polars or pandas dataframe, in bytes."""
+    if hasattr(frame, "estimated_size"):  # polars
+        return frame.estimated_size()
+    return int(frame.memory_usage(deep=True).sum())  # pandas
+
+
+class MemoryCache:
+    """Least recently used cache of dataframes, bounded by their size in memory."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._frames: OrderedDict = OrderedDict()  # key -> (frame, size)
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Any:
+        with self._lock:
+            if key not in self._frames:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._frames.move_to_end(key)
+            return self._frames[key][0]
+
+    def put(self, key: tuple, frame):
+        size = frame_size(frame)
+        if size > self.max_size:
+            return
+        with self._lock:
+            if key in self._frames:
+                self.size -= self._frames.pop(key)[1]
+            self._frames[key] = (frame, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self._frames.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.size = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._frames),
+                "size": self.size,
+                "max_size": self.max_size,
+            }
+
+
+_memory_cache: MemoryCache | None = None
+
+
+def enable_memory_cache(max_size: int = 1024**3):
+    """
+    Keep loaded datasets in memory, so loading them again skips reading the file.
+
+    Args:
+        max_size: Maximum estimated size of the cached dataframes, in bytes.
+            The least recently used dataframes are evicted above this limit.
+    """
+    global _memory_cache
+    _memory_cache = MemoryCache(max_size)
+
+
+def disable_memory_cache():
+    """Stop keeping loaded datasets in memory and release the cached ones."""
+    global _memory_cache
+    _memory_cache = None
+
+
+def get_memory_cache() -> MemoryCache | None:
+    """Return the in-memory cache of datasets, or None if it is disabled."""
+    return _memory_cache
+
+
+def clear_memory_cache():
+    """Release the datasets kept in memory (counters are kept)."""
+    if _memory_cache is not None:
+        _memory_cache.clear()
+
+
+def memory_cache_info() -> dict | None:
+    """
+    Return the statistics of the in-memory cache of datasets.
+
+    Returns:
+        Dictionary with hits, misses, entries, size and max_size (in bytes),
+        or None if the cache is disabled
+    """
+    if _memory_cache is None:
+        return None
+    return _memory_cache.info()
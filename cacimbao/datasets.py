@@ -1,19 +1,48 @@
+from __future__ import annotations
+
 import json
 import logging
+import shutil
+import tempfile
 from abc import abstractmethod
 from dataclasses import dataclass
 from enum import Enum
 from importlib.resources import files
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, ClassVar, Union
 from zipfile import ZipFile
 
-import polars as pl
-
-from cacimbao.helpers import merge_csvs_to_parquet, normalize_column_name, today_label
+from cacimbao.helpers import (
+    CHUNK_SIZE,
+    MAX_CATEGORIES,
+    convert_csvs,
+    data_size,
+    encode_categories,
+    file_sha256,
+    is_sorted,
+    normalize_column_name,
+    order_fragments,
+    scan_fragments,
+    tighten_types,
+    today_label,
+    update_fragments,
+    write_parquet,
+)
+
+if TYPE_CHECKING:
+    from importlib.metadata import EntryPoint
+
+    import polars as pl
 
 logger = logging.getLogger(__name__)
 
+ENTRY_POINT_GROUP = "cacimbao.datasets"
+
+# dataset classes by name, filled in as the classes are defined (or imported)
+_registry: dict[str, type[BaseDataset]] = {}
+# entry points of third-party datasets by name, discovered on first use
+_entry_points: dict[str, EntryPoint] | None = None
+
 
 class Size(Enum):
     """Enum for dataset sizes."""
@@ -32,8 +61,30 @@ class BaseDataset:
     description: str
     url: str  # original URL of the dataset
     local: bool
-    filepath: Path = Path()
+    filepath: Path = Path()  # a parquet file or a hive-partitioned directory
     download_url: str = ""
+    # columns of the optional partitioned layout (e.g. "uf=BA/00000000.parquet")
+    partition_by: ClassVar[tuple[str, ...]] = ()
+    # columns the data is sorted by when written (the most filtered ones first),
+    # so the row group statistics let readers skip the non-matching row groups
+    cluster_by: ClassVar[tuple[str, ...]] = ()
+    row_group_size: ClassVar[int | None] = None  # rows per row group
+    # codec and level of the parquet files: higher zstd levels make smaller
+    # files (for disk or network bound uses), lz4/snappy faster decoding (for
+    # CPU bound ones); see benchmarks/compression.py to compare them
+    compression: ClassVar[str] = "zstd"
+    compression_level: ClassVar[int | None] = None  # the codec default
+    # string columns with up to this many distinct values are stored as
+    # Categorical (dictionary-encoded); 0 keeps all of them as strings
+    max_categories: ClassVar[int] = MAX_CATEGORIES
+    # numeric columns are stored with the smallest lossless type (e.g. Int8)
+    downcast: ClassVar[bool] = True
+
+    def __init_subclass__(cls, **kwargs):
+        """Register every dataset class (i.e. with its own `name`) by name."""
+        super().__init_subclass__(**kwargs)
+        if "name" in cls.__dict__:
+            _registry[cls.name] = cls
 
     @classmethod
     @abstractmethod
@@ -61,12 +112,67 @@ class BaseDataset:
         return f"{cls.dir()}/datapackage-{today_label()}.json"
 
     @classmethod
-    def new_filepath(cls) -> str:
-        filepath = f"{cls.dir()}/{cls.filename_prefix()}-{today_label()}.parquet"
+    def new_filepath(cls, partitioned: bool = False) -> str:
+        """Path of a new version of the data file (a directory if partitioned)."""
+        suffix = "" if partitioned else ".parquet"
+        filepath = f"{cls.dir()}/{cls.filename_prefix()}-{today_label()}{suffix}"
         return str(files("cacimbao.data").joinpath(filepath))
 
+    @classmethod
+    def write(
+        cls,
+        data: pl.DataFrame | pl.LazyFrame,
+        partitioned: bool = False,
+        max_digits: dict[str, int] | None = None,
+        presorted: bool = False,
+    ) -> str:
+        """
+        Write a new version of the dataset to parquet.
+
+        This is the write stage shared by all `prepare` methods: the numeric
+        columns are downcasted to the smallest lossless type (see `downcast`),
+        the low-cardinality string columns are encoded as categories (see
+        `max_categories`), then the data is sorted by `cluster_by` and written
+        in row groups of `row_group_size` rows, with column statistics and
+        the `compression` codec (see `cacimbao.helpers.write_parquet`).
+
+        Args:
+            data: Data of the dataset
+            partitioned: If True, write one directory per value of the
+                `partition_by` columns (hive layout, e.g. `uf=BA/`), so
+                queries filtered by these columns only read the matching files
+            max_digits: Declared number of digits of the integer columns, if
+                known (see `cacimbao.helpers.tighten_types`)
+            presorted: If True, the data is already sorted by `cluster_by`
+                (e.g. piece by piece, see `cacimbao.helpers.order_fragments`)
+                and is written as it is computed, without sorting the whole
+                table in memory
+
+        Returns:
+            Path of the parquet file (or directory, if partitioned)
+        """
+        if partitioned and not cls.partition_by:
+            raise ValueError(
+                f"A base de dados '{cls.name}' não define colunas de partição."
+            )
+        if cls.downcast:
+            data = tighten_types(data, max_digits)
+        if cls.max_categories:
+            data = encode_categories(data, cls.max_categories)
+        return write_parquet(
+            data,
+            cls.new_filepath(partitioned),
+            partition_by=cls.partition_by if partitioned else None,
+            sort_by=None if presorted else cls.cluster_by,
+            row_group_size=cls.row_group_size,
+            compression=cls.compression,
+            compression_level=cls.compression_level,
+        )
+
     @classmethod
     def create_datapackage_from_file(cls, filepath_str: str):
+        import polars as pl
+
         filepath = Path(filepath_str)
         datapackage = {
             "name": filepath.name,
@@ -75,6 +181,8 @@ class BaseDataset:
             "scheme": "file",
             "format": "parquet",
             "mediatype": "application/parquet",
+            "bytes": data_size(filepath),
+            "hash": f"sha256:{file_sha256(filepath)}",
             "schema": {"fields": []},
         }
 
@@ -96,10 +204,20 @@ class BaseDataset:
             "Datetime": "datetime",
             "Time": "time",
         }
-        schema = pl.scan_parquet(filepath).collect_schema()
+        lf = pl.scan_parquet(filepath)
+        schema = lf.collect_schema()
+        categorical = [col for col, dtype in schema.items() if dtype == pl.Categorical]
+        categories = lf.select(
+            pl.col(categorical).cast(pl.String).drop_nulls().unique().sort().implode()
+        ).collect(engine="streaming")
         for col, dtype in schema.items():
             field_type = polars_to_datapackage_type_mapping.get(str(dtype), "string")
-            datapackage["schema"]["fields"].append({"name": col, "type": field_type})
+            field = {"name": col, "type": field_type}
+            if dtype.is_numeric():  # the exact (downcasted) type
+                field["dtype"] = str(dtype)
+            if col in categorical:  # the values found in the data
+                field["constraints"] = {"enum": categories[col][0].to_list()}
+            datapackage["schema"]["fields"].append(field)
 
         datapackage_filepath = Path(cls.new_datapackage_filepath())
         datapackage_filepath.write_text(
@@ -146,22 +264,68 @@ class PescadoresEPescadorasProfissionaisDataset(BaseDataset):
         "pescadores-e-pescadoras-profissionais/pescadores-e-pescadoras-profissionais-07062025.parquet"
     )
 
+    partition_by = ("UF",)
+    cluster_by = ("UF", "Municipio")
+    row_group_size = 100_000
+
     @classmethod
-    def prepare(cls, csv_dir: str):
-        """Merge the CSVs from the states into one parquet file and remove personal information."""
-        output_filepath = cls.new_filepath()
+    def prepare(
+        cls,
+        csv_dir: str,
+        partitioned: bool = False,
+        parallel: bool = False,
+        max_workers: int | None = None,
+        build_dir: str | None = None,
+    ):
+        """Merge the CSVs from the states into one parquet file and remove personal information.
+
+        With `partitioned=True`, the output is a directory with one parquet file per state.
+        Each state CSV is converted on its own, with its separator guessed from its header
+        and sorted by `cluster_by`, so only one state is held in memory (per process).
+        With `parallel=True`, up to `max_workers` CSVs are converted at the same time, each
+        by its own process. With a `build_dir`, the converted CSVs are kept there and only
+        the new or changed CSVs are converted again in the next runs (in parallel).
+        """
+        import polars as pl
+
         drop_columns = ["CPF", "Nome do Pescador"]  # personal information
-        merge_csvs_to_parquet(
-            Path(csv_dir),
-            output_filepath,
-            drop_columns,
-            separator=";",
-            truncate_ragged_lines=True,
-        )
+        csv_files = sorted(Path(csv_dir).glob("*.csv"))
+        if build_dir is not None:
+            fragments = update_fragments(
+                csv_files,
+                Path(build_dir),
+                drop_columns,
+                max_workers,
+                cls.cluster_by,
+                truncate_ragged_lines=True,
+            )
+            output_filepath = cls._write_fragments(fragments, partitioned)
+        else:
+            with tempfile.TemporaryDirectory(dir=cls.dir()) as fragments_dir:
+                fragments = convert_csvs(
+                    csv_files,
+                    fragments_dir,
+                    drop_columns,
+                    max_workers if parallel else 1,
+                    cls.cluster_by,
+                    truncate_ragged_lines=True,
+                )
+                output_filepath = cls._write_fragments(fragments, partitioned)
 
         cls.create_datapackage_from_file(output_filepath)
         return pl.read_parquet(output_filepath)
 
+    @classmethod
+    def _write_fragments(cls, fragments: list[Path], partitioned: bool) -> str:
+        # one CSV per state: the states, each sorted on its own, are written in
+        # order instead of sorting the whole table in memory
+        ordered = order_fragments(fragments, cls.cluster_by)
+        return cls.write(
+            scan_fragments(ordered or fragments),
+            partitioned,
+            presorted=ordered is not None,
+        )
+
 
 class SalarioMinimoRealVigenteDataset(BaseDataset):
     """Dataset for real and current minimum wage in Brazil."""
@@ -179,6 +343,7 @@ class SalarioMinimoRealVigenteDataset(BaseDataset):
     filepath: Path = Path(
         "salario-minimo-real-vigente/salario-minimo-real-vigente-04062025.parquet"
     )
+    cluster_by = ("Data",)
 
     @classmethod
     def prepare(cls, real_salary_filepath: str, current_salary_filepath: str):
@@ -188,6 +353,8 @@ class SalarioMinimoRealVigenteDataset(BaseDataset):
         * Salário mínimo real (GAC12_SALMINRE12)
         * Salário mínimo vigente (MTE12_SALMIN12)
         """
+        import polars as pl
+
         real = pl.read_csv(
             real_salary_filepath,
             separator=";",
@@ -226,9 +393,9 @@ class SalarioMinimoRealVigenteDataset(BaseDataset):
             .str.replace(",", ".")
             .cast(pl.Float64)
         )
-        combined_data.write_parquet(cls.new_filepath())
+        output_filepath = cls.write(combined_data)
 
-        cls.create_datapackage_from_file(cls.new_filepath())
+        cls.create_datapackage_from_file(output_filepath)
         return combined_data
 
 
@@ -246,15 +413,17 @@ class AldeiasIndigenasDataset(BaseDataset):
     # from: https://dados.gov.br/dados/conjuntos-dados/tabela-de-aldeias-indgenas
     url: str = "https://www.gov.br/funai/pt-br/acesso-a-informacao/dados-abertos/base-de-dados/Tabeladealdeias.ods"
     filepath: Path = Path("aldeias-indigenas/aldeias-indigenas-08062025.parquet")
+    cluster_by = ("nomuf", "cod_municipio")
 
     @classmethod
     def prepare(cls, filepath: str):
         """The ODS file is open in LibreOffice Calc and saved as a CSV file.
         It is not possible to read the ODS file directly with Polars due to an open issue:
         https://github.com/pola-rs/polars/issues/14053"""
+        import polars as pl
+
         df = pl.read_csv(source=filepath)
-        filepath = cls.new_filepath()
-        df.write_parquet(filepath)
+        filepath = cls.write(df)
         cls.create_datapackage_from_file(filepath)
         return df
 
@@ -284,9 +453,15 @@ class PesquisaNacionalDeSaude2019Dataset(BaseDataset):
     filepath: Path = Path(
         "pesquisa-nacional-de-saude-2019/pesquisa-nacional-de-saude-2019-25072025.parquet"
     )
+    cluster_by = ("V0001__unidade_da_federacao",)
+    # the parquet writer buffers a whole row group: with 1,087 columns, a
+    # small one keeps the buffer of the writer small
+    row_group_size = 20_000
 
     @classmethod
     def prepare(cls, zip_filepath: str) -> pl.DataFrame:
+        import polars as pl
+
         logger.info("Preparando o dicionário de dados...")
         data_dict = cls._data_dict()
         logger.info("Hora descompactar o arquivo .zip e criar o .parquet...")
@@ -299,16 +474,40 @@ class PesquisaNacionalDeSaude2019Dataset(BaseDataset):
 
     @classmethod
     def _create_parquet_file(cls, zip_filepath: str, data_dict: dict) -> str:
-        index = zip_filepath.rfind("/")
-        csv_filename = zip_filepath[index + 1 :].replace(".zip", ".csv")
-        df = pl.read_csv(ZipFile(zip_filepath).read(csv_filename))
-        df.columns = [field["alternative_name"] for field in data_dict.values()]
-
-        df.write_parquet(cls.new_filepath())
-        return cls.new_filepath()
+        import polars as pl
+
+        csv_filename = Path(zip_filepath).with_suffix(".csv").name
+        # most answers are codes of 1 or 2 digits, declared in the data dictionary
+        max_digits = {
+            field["alternative_name"]: int(field["length"])
+            for field in data_dict.values()
+            if field.get("length")
+        }
+        # next to the data, as /tmp may be in memory (tmpfs)
+        with tempfile.TemporaryDirectory(dir=cls.dir()) as spill_dir:
+            # decompressed to disk in chunks and scanned lazily, so the CSV is
+            # never held in memory
+            csv_filepath = Path(spill_dir) / csv_filename
+            with (
+                ZipFile(zip_filepath) as zip_file,
+                zip_file.open(csv_filename) as source,
+                open(csv_filepath, "wb") as target,
+            ):
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+            lf = pl.scan_csv(
+                csv_filepath,
+                new_columns=[field["alternative_name"] for field in data_dict.values()],
+            )
+            # the microdata is published in state order: then it is not sorted
+            # again, which would hold the whole table in memory
+            return cls.write(
+                lf, max_digits=max_digits, presorted=is_sorted(lf, cls.cluster_by)
+            )
 
     @classmethod
     def _data_dict(cls):
+        import polars as pl
+
         data_dict_file = pl.read_excel(
             f"{cls.dir()}/dicionario_PNS_microdados_2019_23062023.xls",
             read_options={"header_row": 3},
@@ -347,6 +546,7 @@ class PesquisaNacionalDeSaude2019Dataset(BaseDataset):
                     "name": row["codigo_da_variavel"],
                     "alternative_name": f"{row['codigo_da_variavel']}__{normalized_question}",
                     "description": f"{row['quesito_descricao']} (seção: {section}). Tamanho: {row['tamanho']}.",
+                    "length": row["tamanho"],
                 }
             else:
                 categories[row["categorias_tipo"]] = row["categorias_descricao"]
@@ -373,10 +573,18 @@ class SinPatinhasDataset(BaseDataset):
     url: str = "https://buscalai.cgu.gov.br/PedidosLai/DetalhePedido?id=9499381"
     filepath: Path = Path("sinpatinhas/sinpatinhas-09122025.parquet")
 
+    partition_by = ("uf",)
+    cluster_by = ("uf", "no_municipio", "datacadastro")
+    row_group_size = 50_000
+
     @classmethod
-    def prepare(cls, csv_filepath: str):
-        """Read unzipped csv filepath and convert it to a parquet file."""
-        output_filepath = cls.new_filepath()
+    def prepare(cls, csv_filepath: str, partitioned: bool = False):
+        """Read unzipped csv filepath and convert it to a parquet file.
+
+        With `partitioned=True`, the output is a directory with one parquet file per state.
+        """
+        import polars as pl
+
         df = pl.read_csv(
             csv_filepath,
             separator=";",
@@ -384,33 +592,71 @@ class SinPatinhasDataset(BaseDataset):
         ).with_columns(
             pl.col("datacadastro").str.to_date(format="%d/%m/%Y"),
         )
-        df.write_parquet(output_filepath)
+        output_filepath = cls.write(df, partitioned)
         cls.create_datapackage_from_file(output_filepath)
         return pl.read_parquet(output_filepath)
 
 
+def _plugin_entry_points() -> dict[str, EntryPoint]:
+    """Discover (only once) the datasets provided by other packages.
+
+    Packages provide datasets through the `cacimbao.datasets` entry point
+    group, where the entry point name is the dataset name, e.g.:
+
+        [project.entry-points."cacimbao.datasets"]
+        minha_base = "meu_pacote.datasets:MinhaBaseDataset"
+    """
+    global _entry_points
+    if _entry_points is None:
+        from importlib.metadata import entry_points
+
+        _entry_points = {
+            entry_point.name: entry_point
+            for entry_point in entry_points(group=ENTRY_POINT_GROUP)
+        }
+    return _entry_points
+
+
+def _load_plugin(name: str) -> type[BaseDataset] | None:
+    entry_point = _plugin_entry_points().get(name)
+    if entry_point is None:
+        return None
+    dataset = entry_point.load()
+    if not (isinstance(dataset, type) and issubclass(dataset, BaseDataset)):
+        raise TypeError(
+            f"O entry point '{entry_point.value}' da base de dados '{name}' "
+            "não é uma subclasse de BaseDataset."
+        )
+    _registry[name] = dataset
+    return dataset
+
+
 def list_datasets(include_metadata=False) -> list:
     """
     List available datasets.
 
     Args:
         include_metadata: If True, returns metadata for each dataset.
+            Datasets provided by other packages are imported to read it.
 
     Returns:
         List of dataset names or a list of dictionaries with dataset metadata.
     """
+    names = list(_registry)
+    names += [name for name in _plugin_entry_points() if name not in _registry]
+    if not include_metadata:
+        return names
+
     all_datasets = []
-    for dataset in BaseDataset.__subclasses__():
+    for name in names:
+        dataset = get_dataset(name)
         dataset_attributes = dataset.__dataclass_fields__.keys()
-        if include_metadata:
-            metadata = {
-                key: value
-                for key, value in dataset.__dict__.items()
-                if key in dataset_attributes
-            }
-            all_datasets.append(metadata)
-        else:
-            all_datasets.append(dataset.name)
+        metadata = {
+            key: value
+            for key, value in dataset.__dict__.items()
+            if key in dataset_attributes
+        }
+        all_datasets.append(metadata)
     return all_datasets
 
 
@@ -424,9 +670,9 @@ def get_dataset(name: str):
     Returns:
         An instance of the dataset class.
     """
-    for dataset in BaseDataset.__subclasses__():
-        if dataset.name == name:
-            return dataset
+    dataset = _registry.get(name) or _load_plugin(name)
+    if dataset is not None:
+        return dataset
     raise ValueError(
         f"Base de dados '{name}' não encontrada. Use list_datasets() para ver as bases disponíveis."
     )
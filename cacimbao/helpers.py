@@ -1,39 +1,407 @@
-import io
+from __future__ import annotations
+
+import hashlib
 import json
+import mmap
+import os
 import re
+import shutil
+import threading
 import zipfile
 from datetime import date
+from itertools import repeat
 from pathlib import Path
-from typing import Dict
+from typing import TYPE_CHECKING, Dict
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    import polars as pl
+    import requests
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+# string columns with few distinct values are stored as categories (see
+# `encode_categories`)
+MAX_CATEGORIES = 1024
+MAX_CATEGORY_RATIO = 0.5
+# separators recognized in the header of csv files (see `sniff_separator`)
+CSV_SEPARATORS = (";", ",", "\t", "|")
+BUILD_MANIFEST_FILENAME = "build.json"  # see `update_fragments`
+# bits of the integer types, by name (polars is only imported when needed)
+INTEGER_BITS = {
+    "Int8": 8,
+    "UInt8": 8,
+    "Int16": 16,
+    "UInt16": 16,
+    "Int32": 32,
+    "UInt32": 32,
+    "Int64": 64,
+    "UInt64": 64,
+    "Int128": 128,
+    "UInt128": 128,
+}
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_session_config = {
+    "retries": 5,
+    "backoff_factor": 0.5,
+    "backoff_max": 30.0,
+    "timeout": (10.0, 60.0),
+    "pool_maxsize": 16,
+}
+
+
+def configure_session(
+    retries: int = 5,
+    backoff_factor: float = 0.5,
+    backoff_max: float = 30.0,
+    timeout: tuple[float, float] = (10.0, 60.0),
+    pool_maxsize: int = 16,
+):
+    """
+    Configure the HTTP session shared by all remote downloads.
+
+    Args:
+        retries: Maximum number of retries on connection errors and on
+            429/5xx responses
+        backoff_factor: Base of the exponential backoff between retries (seconds)
+        backoff_max: Maximum backoff between two retries (seconds)
+        timeout: Connect and read timeouts (seconds)
+        pool_maxsize: Maximum number of connections kept alive per host
+    """
+    global _session
+    with _session_lock:
+        _session_config.update(
+            retries=retries,
+            backoff_factor=backoff_factor,
+            backoff_max=backoff_max,
+            timeout=timeout,
+            pool_maxsize=pool_maxsize,
+        )
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def get_session() -> requests.Session:
+    """
+    Return the HTTP session shared by all remote downloads.
+
+    The session keeps connections alive across downloads (connection pooling)
+    and retries failed requests with a bounded exponential backoff.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=_session_config["retries"],
+                backoff_factor=_session_config["backoff_factor"],
+                backoff_max=_session_config["backoff_max"],
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD"}),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                max_retries=retry,
+                pool_connections=_session_config["pool_maxsize"],
+                pool_maxsize=_session_config["pool_maxsize"],
+            )
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """Send a GET request with the shared session and the configured timeouts."""
+    kwargs.setdefault("timeout", _session_config["timeout"])
+    return get_session().get(url, **kwargs)
+
+
+def _resume_validator(part_info: dict) -> str | None:
+    """Return the validator used in `If-Range` to resume a partial download.
+
+    Weak ETags cannot be used with `If-Range`, so `Last-Modified` is used instead.
+    """
+    etag = part_info.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return part_info.get("last_modified")
+
+
+def _content_range_start(response: requests.Response) -> int | None:
+    """Return the first byte position of a `Content-Range` header, if any."""
+    match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+
+def _content_range_size(response: requests.Response) -> int | None:
+    """Return the complete length of a `Content-Range` header, if known."""
+    match = re.search(r"/(\d+)$", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+
+def download_file(
+    url: str,
+    filepath: Path,
+    chunk_size: int = CHUNK_SIZE,
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> dict | None:
+    """
+    Download a file from a URL, streaming it to disk in chunks.
+
+    The file is written to `<filepath>.part` and only renamed to `filepath`
+    when complete. If a previous download of the same URL was interrupted, it
+    is resumed with a `Range` request. The `If-Range` validator makes sure the
+    missing bytes are only appended if the file did not change on the server;
+    otherwise the server sends the whole file again. A partial file that was
+    already complete (the server answers 416 with its size) is just renamed. A partial response that
+    does not start at the end of the partial file is discarded, and the file
+    is downloaded again from the start.
+
+    When `etag` or `last_modified` are given, the request is conditional
+    (`If-None-Match` / `If-Modified-Since`) and nothing is transferred if
+    the file did not change on the server.
+
+    Args:
+        url: URL of the file
+        filepath: Path where the file will be written
+        chunk_size: Number of bytes read from the response at a time
+        etag: ETag of the version of the file we already have
+        last_modified: Last-Modified date of the version of the file we already have
+
+    Returns:
+        The validators of the downloaded file (`etag` and `last_modified`),
+        or None if the file was not modified
+    """
+    import requests
+
+    part_filepath = filepath.with_name(f"{filepath.name}.part")
+    part_info_filepath = filepath.with_name(f"{filepath.name}.part.json")
+
+    # byte offsets only make sense for the raw (not re-encoded) file
+    headers = {"Accept-Encoding": "identity"}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    offset = 0
+    part_info = {}
+    if part_info_filepath.exists():
+        part_info = json.loads(part_info_filepath.read_text())
+    validator = _resume_validator(part_info)
+    if part_info.get("url") == url and validator and part_filepath.exists():
+        offset = part_filepath.stat().st_size
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+
+    with http_get(url, headers=headers, stream=True) as response:
+        if response.status_code == 304:
+            part_filepath.unlink(missing_ok=True)
+            part_info_filepath.unlink(missing_ok=True)
+            return None
+        if response.status_code == 416:
+            if offset and _content_range_size(response) == offset:
+                # nothing left to download: the partial file is complete (the
+                # range is only checked if the `If-Range` validator matches)
+                part_filepath.replace(filepath)
+                part_info_filepath.unlink()
+                return {
+                    "etag": part_info.get("etag"),
+                    "last_modified": part_info.get("last_modified"),
+                }
+            # stale partial file, start over
+            part_filepath.unlink(missing_ok=True)
+            part_info_filepath.unlink(missing_ok=True)
+            return download_file(url, filepath, chunk_size, etag, last_modified)
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            raise requests.HTTPError(f"Falha ao baixar o arquivo: {e}")
+
+        resumed = response.status_code == 206
+        if resumed and _content_range_start(response) != offset:
+            if not offset:
+                raise requests.HTTPError(
+                    "Falha ao baixar o arquivo: o servidor enviou apenas uma parte."
+                )
+            # not the missing bytes: the partial file cannot be completed
+            part_filepath.unlink(missing_ok=True)
+            part_info_filepath.unlink(missing_ok=True)
+            return download_file(url, filepath, chunk_size, etag, last_modified)
+
+        validators = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        part_info_filepath.write_text(json.dumps({"url": url, **validators}))
+        with open(part_filepath, "ab" if resumed else "wb") as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+
+    part_filepath.replace(filepath)
+    part_info_filepath.unlink()
+    return validators
+
+
+def extract_zip(zip_filepath: Path, target_dir: Path):
+    """
+    Extract a zip file member by member.
+
+    Each member is decompressed straight to disk (in chunks), so only one member
+    is open at a time and nothing is held in memory.
 
-import polars as pl
-import requests
+    Args:
+        zip_filepath: Path to the zip file
+        target_dir: Directory to extract the contents to
+    """
+    try:
+        with zipfile.ZipFile(zip_filepath) as zf:
+            for member in zf.infolist():
+                zf.extract(member, path=target_dir)
+    except zipfile.BadZipFile as e:
+        raise zipfile.BadZipFile(f"O arquivo baixado não é um ZIP válido: {e}")
 
 
 def download_and_extract_zip(url: str, target_dir: Path) -> Path:
     """
     Download and extract a zip file from a URL.
 
+    The zip file is streamed to disk inside `target_dir` and removed after the
+    extraction, so the memory usage does not depend on its size. An interrupted
+    download is resumed the next time this function is called.
+
     Args:
         url: URL of the zip file
         target_dir: Directory to extract the contents to
     """
     target_dir.mkdir(parents=True, exist_ok=True)
 
-    response = requests.get(url, stream=True)
-    try:
-        response.raise_for_status()
-    except requests.HTTPError as e:
-        raise requests.HTTPError(f"Falha ao baixar o arquivo: {e}")
-
+    zip_filename = Path(urlparse(url).path).name or "download.zip"
+    zip_filepath = target_dir / zip_filename
+    download_file(url, zip_filepath)
     try:
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
-            zf.extractall(path=target_dir)
-    except zipfile.BadZipFile as e:
-        raise zipfile.BadZipFile(f"O arquivo baixado não é um ZIP válido: {e}")
+        extract_zip(zip_filepath, target_dir)
+    finally:
+        zip_filepath.unlink(missing_ok=True)
     return target_dir
 
 
+def data_files(path: Path) -> list[Path]:
+    """
+    List the data files of a dataset path.
+
+    Args:
+        path: A data file or a (hive-partitioned) directory of parquet files
+
+    Returns:
+        The file itself or the parquet files of the directory, in a stable order
+    """
+    path = Path(path)
+    if path.is_dir():
+        return sorted(path.rglob("*.parquet"))
+    return [path]
+
+
+def data_size(path: Path) -> int:
+    """Return the size, in bytes, of a data file or partitioned directory."""
+    return sum(file.stat().st_size for file in data_files(path))
+
+
+def _hash_file(digest, filepath: Path, chunk_size: int, use_mmap: bool):
+    with open(filepath, "rb") as f:
+        if use_mmap and os.fstat(f.fileno()).st_size:  # empty files cannot be mapped
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    for start in range(0, len(view), chunk_size):
+                        digest.update(view[start : start + chunk_size])
+        else:
+            buffer = bytearray(chunk_size)  # reused for every chunk
+            with memoryview(buffer) as view:
+                while size := f.readinto(buffer):
+                    digest.update(view[:size])
+
+
+def file_hash(
+    filepath: Path,
+    algorithm: str = "sha256",
+    chunk_size: int = CHUNK_SIZE,
+    use_mmap: bool = False,
+) -> str:
+    """
+    Compute the checksum of a file, in fixed-size chunks.
+
+    The checksum of a partitioned directory is the one of its parquet files
+    concatenated (see `data_files`), like a multipart datapackage resource.
+
+    Args:
+        filepath: Path to the file (or partitioned directory)
+        algorithm: Name of the hashlib algorithm (e.g. "sha256")
+        chunk_size: Number of bytes hashed at a time
+        use_mmap: If True, hash slices of the memory-mapped file instead of
+            reading it into a buffer (avoids a copy per chunk)
+
+    Returns:
+        Hexadecimal digest of the file
+    """
+    digest = hashlib.new(algorithm)
+    for path in data_files(filepath):
+        _hash_file(digest, path, chunk_size, use_mmap)
+    return digest.hexdigest()
+
+
+def file_sha256(filepath: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """Compute the SHA-256 checksum of a file, reading it in chunks."""
+    return file_hash(filepath, "sha256", chunk_size)
+
+
+def parse_hash(value: str) -> tuple[str, str]:
+    """
+    Split a datapackage `hash` into algorithm and digest.
+
+    Following the Frictionless Data specification, the hash is prefixed by the
+    algorithm name (e.g. "sha256:ab12...") and is an MD5 digest otherwise.
+    """
+    algorithm, _, digest = value.rpartition(":")
+    return (algorithm or "md5").lower(), digest.lower()
+
+
+def verify_checksum(
+    filepath: Path,
+    expected_hash: str,
+    expected_bytes: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    use_mmap: bool = False,
+) -> bool:
+    """
+    Check that a file matches a datapackage `hash` (and `bytes`, if given).
+
+    The size is compared first, so truncated files are detected without
+    reading them.
+
+    Args:
+        filepath: Path to the file
+        expected_hash: Expected checksum, e.g. "sha256:ab12..."
+        expected_bytes: Expected size of the file, in bytes
+        chunk_size: Number of bytes hashed at a time
+        use_mmap: If True, hash the memory-mapped file (see `file_hash`)
+
+    Returns:
+        True if the file is intact
+    """
+    if expected_bytes is not None and data_size(filepath) != expected_bytes:
+        return False
+    algorithm, digest = parse_hash(expected_hash)
+    return file_hash(filepath, algorithm, chunk_size, use_mmap) == digest
+
+
 def load_datapackage(datapackage_path: Path) -> Dict:
     """
     Load and parse a datapackage.json file.
@@ -53,16 +421,468 @@ def today_label() -> str:
     return date.today().strftime("%d%m%Y")
 
 
-def merge_csvs_to_parquet(
-    data_dir: Path, output_file: str, drop_columns=None, **read_csv_kwargs
-):
-    """Given a directory with csv files, merge them into a single parquet file."""
-    data_dir_glob = f"{data_dir}/*.csv"
-    df = pl.read_csv(data_dir_glob, **read_csv_kwargs)
-    if drop_columns:
-        df = df.drop(drop_columns)
-    df.write_parquet(output_file)
-    return output_file
+def encode_categories(
+    data: pl.DataFrame | pl.LazyFrame,
+    max_categories: int = MAX_CATEGORIES,
+    max_ratio: float = MAX_CATEGORY_RATIO,
+) -> pl.LazyFrame:
+    """
+    Store the low-cardinality string columns as `Categorical` columns.
+
+    Categorical values are dictionary-encoded: each row holds a small integer
+    code instead of the string, which saves memory and speeds up `group_by`
+    and joins. Unlike `Enum`, the categories are not fixed by the type, so
+    the columns still compare and concatenate with any string, and they sort
+    by their string values. The distinct values are counted approximately
+    (HyperLogLog), in constant memory, so a column right at the limits may
+    be kept as strings.
+
+    Args:
+        data: Data to be encoded
+        max_categories: Maximum number of distinct values of an encoded column
+        max_ratio: Maximum ratio of distinct values to rows of an encoded
+            column (columns of mostly unique values are kept as strings)
+
+    Returns:
+        LazyFrame with the encoded columns
+    """
+    import polars as pl
+
+    lf = data.lazy()
+    string_columns = [
+        column for column, dtype in lf.collect_schema().items() if dtype == pl.String
+    ]
+    if not string_columns:
+        return lf
+
+    counts = (
+        lf.select(pl.len(), pl.col(string_columns).approx_n_unique())
+        .collect(engine="streaming")
+        .row(0, named=True)
+    )
+    limit = min(max_categories, counts.pop("len") * max_ratio)
+    columns = [column for column, count in counts.items() if count <= limit]
+    return lf.with_columns(pl.col(columns).cast(pl.Categorical))
+
+
+def _integer_bits(dtype) -> int:
+    return INTEGER_BITS[dtype.base_type().__name__]
+
+
+def _smallest_integer_type(
+    low: int, high: int, prefer_unsigned: bool = False
+) -> pl.DataType | None:
+    """Return the smallest integer type holding `low` to `high`, if up to 32 bits."""
+    import polars as pl
+
+    sizes = (
+        (8, pl.Int8, pl.UInt8),
+        (16, pl.Int16, pl.UInt16),
+        (32, pl.Int32, pl.UInt32),
+    )
+    for bits, signed, unsigned in sizes:
+        fits_signed = -(2 ** (bits - 1)) <= low and high < 2 ** (bits - 1)
+        fits_unsigned = 0 <= low and high < 2**bits
+        if fits_unsigned and (prefer_unsigned or not fits_signed):
+            return unsigned
+        if fits_signed:
+            return signed
+    return None
+
+
+def tighten_types(
+    data: pl.DataFrame | pl.LazyFrame, max_digits: dict[str, int] | None = None
+) -> pl.LazyFrame:
+    """
+    Downcast the numeric columns to the smallest lossless type.
+
+    Integer columns get the smallest type that holds their values (e.g. `Int8`
+    for ages, or `UInt8` for codes up to 255), keeping their signedness when
+    both fit, and `Float64` columns become `Float32` if no value loses
+    precision. All the statistics are computed in a single pass.
+
+    Args:
+        data: Data to be downcasted
+        max_digits: Declared number of digits of integer columns (e.g. from a
+            data dictionary): the type also holds any value of that size, so it
+            does not change between versions of the data with different ranges
+
+    Returns:
+        LazyFrame with the downcasted columns
+    """
+    import polars as pl
+
+    max_digits = max_digits or {}
+    lf = data.lazy()
+    schema = lf.collect_schema()
+    integers = [column for column, dtype in schema.items() if dtype.is_integer()]
+    floats = [column for column, dtype in schema.items() if dtype == pl.Float64]
+    if not integers and not floats:
+        return lf
+
+    as_float32 = pl.col(floats).cast(pl.Float32).cast(pl.Float64)
+    row = (
+        lf.select(
+            pl.col(integers).min().name.suffix(":min"),
+            pl.col(integers).max().name.suffix(":max"),
+            ((as_float32 == pl.col(floats)) | pl.col(floats).is_nan())
+            .fill_null(True)
+            .all()
+            .name.suffix(":float32"),
+        )
+        .collect(engine="streaming")
+        .row(0, named=True)
+    )
+
+    casts = {}
+    for column in integers:
+        low, high = row[f"{column}:min"], row[f"{column}:max"]
+        if low is None:  # only nulls
+            continue
+        if column in max_digits:
+            high = max(high, 10 ** int(max_digits[column]) - 1)
+        dtype = _smallest_integer_type(
+            low, high, prefer_unsigned=schema[column].is_unsigned_integer()
+        )
+        # never widened (e.g. UInt64 values above the maximum of Int64)
+        if dtype is not None and _integer_bits(dtype) < _integer_bits(schema[column]):
+            casts[column] = dtype
+    for column in floats:
+        if row[f"{column}:float32"]:
+            casts[column] = pl.Float32
+    return lf.with_columns(
+        pl.col(column).cast(dtype) for column, dtype in casts.items()
+    )
+
+
+def write_parquet(
+    data: pl.DataFrame | pl.LazyFrame,
+    output_path: str,
+    partition_by=None,
+    sort_by=None,
+    row_group_size: int | None = None,
+    compression: str = "zstd",
+    compression_level: int | None = None,
+) -> str:
+    """
+    Write a dataset to parquet, laid out for selective reads.
+
+    Rows are sorted by `sort_by`, so rows with the same keys end up in the
+    same row groups, and the min/max statistics of every column are written,
+    so readers filtering on these keys skip the other row groups.
+
+    Args:
+        data: Data to be written (a LazyFrame is written as it is computed)
+        output_path: Path of the parquet file (or directory, if partitioned)
+        partition_by: Columns to partition by: one directory per value
+            (hive layout, e.g. `uf=BA/`)
+        sort_by: Columns to sort by before writing
+        row_group_size: Maximum number of rows per row group (polars default if None)
+        compression: Compression codec: "zstd", "lz4", "snappy", "gzip",
+            "brotli" or "uncompressed"
+        compression_level: Level of the codec (zstd: 1-22, gzip: 0-9,
+            brotli: 0-11), the codec default if None
+
+    Returns:
+        The output path
+    """
+    import polars as pl
+
+    lf = data.lazy()
+    if sort_by:
+        # stable, so rows with the same keys keep their order and the same
+        # input always gives the same file (and checksum)
+        lf = lf.sort(list(sort_by), maintain_order=True)
+    target = output_path
+    if partition_by:
+        shutil.rmtree(output_path, ignore_errors=True)
+        target = pl.PartitionByKey(output_path, by=list(partition_by), include_key=True)
+    lf.sink_parquet(
+        target,
+        compression=compression,
+        compression_level=compression_level,
+        statistics=True,
+        row_group_size=row_group_size,
+        mkdir=True,
+    )
+    return output_path
+
+
+def is_sorted(data: pl.DataFrame | pl.LazyFrame, sort_by) -> bool:
+    """
+    Tell whether the rows are already sorted by `sort_by`, as `write_parquet` sorts.
+
+    Only the `sort_by` columns are read, in one pass, so data published in
+    order can be written without sorting the whole table in memory. Columns
+    with nulls are reported as not sorted.
+
+    Args:
+        data: Data to be checked
+        sort_by: Columns the data should be sorted by
+
+    Returns:
+        True if every row comes after (or ties with) the previous one
+    """
+    import polars as pl
+
+    columns = list(sort_by)
+    in_order = pl.lit(True)
+    for column in reversed(columns):  # the first column that differs decides
+        current, previous = pl.col(column), pl.col(column).shift(1)
+        in_order = (current > previous) | ((current == previous) & in_order)
+    in_order, nulls = (
+        data.lazy()
+        .select(
+            in_order.slice(1).all().alias("in_order"),
+            pl.any_horizontal(pl.col(columns).is_null().any()).alias("nulls"),
+        )
+        .collect(engine="streaming")
+        .row(0)
+    )
+    return in_order and not nulls
+
+
+def sniff_separator(csv_file: Path) -> str:
+    """Guess the separator of a csv file: the most frequent one in its header."""
+    with open(csv_file, encoding="utf-8-sig", errors="replace") as f:
+        header = f.readline()
+    return max(CSV_SEPARATORS, key=header.count)
+
+
+def _limit_polars_threads(threads: int):
+    # runs in each worker process before polars is imported
+    os.environ["POLARS_MAX_THREADS"] = str(threads)
+
+
+def _convert_csv(
+    csv_file: Path, fragment: Path, drop_columns, sort_by, scan_csv_kwargs: dict
+) -> Path:
+    import polars as pl
+
+    kwargs = {"separator": sniff_separator(csv_file), **scan_csv_kwargs}
+    try:
+        lf = pl.scan_csv(csv_file, **kwargs)
+        if drop_columns:
+            lf = lf.drop(drop_columns)
+        if sort_by:
+            lf = lf.sort(list(sort_by), maintain_order=True)
+        lf.sink_parquet(fragment, statistics=True)
+    except pl.exceptions.PolarsError as e:
+        raise ValueError(f"Erro ao converter o arquivo {csv_file}: {e}") from e
+    return fragment
+
+
+def convert_csvs(
+    csv_files: list[Path],
+    fragments_dir: Path,
+    drop_columns=None,
+    max_workers: int | None = None,
+    sort_by=None,
+    **scan_csv_kwargs,
+) -> list[Path]:
+    """
+    Convert csv files to parquet fragments in parallel, one process per file.
+
+    Each file is parsed (and validated) on its own, with its separator guessed
+    from its header unless `separator` is given, so files of the same source
+    with different separators or layouts can be combined by `scan_fragments`.
+
+    Args:
+        csv_files: Paths of the csv files
+        fragments_dir: Directory for the parquet fragments (named after the files)
+        drop_columns: Columns to drop (e.g. personal information)
+        max_workers: Maximum number of files converted at the same time
+            (the number of CPUs if None); with 1, the files are converted one
+            after the other in this process
+        sort_by: Columns to sort each fragment by (one file at a time is held
+            in memory per process, see `order_fragments`)
+        **scan_csv_kwargs: Arguments to `polars.scan_csv` (e.g.
+            `truncate_ragged_lines`)
+
+    Returns:
+        Paths of the fragments, in the order of the csv files
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    csv_files = [Path(csv_file) for csv_file in csv_files]
+    if not csv_files:
+        return []
+    fragments = [Path(fragments_dir) / f"{file.stem}.parquet" for file in csv_files]
+    cpus = os.cpu_count() or 1
+    max_workers = min(max_workers or cpus, len(csv_files))
+    if max_workers == 1:
+        return [
+            _convert_csv(csv_file, fragment, drop_columns, sort_by, scan_csv_kwargs)
+            for csv_file, fragment in zip(csv_files, fragments)
+        ]
+    # the CPUs are split among the processes instead of each polars using all of
+    # them; spawned (not forked) as forking a process running polars threads
+    # can deadlock
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_limit_polars_threads,
+        initargs=(max(1, cpus // max_workers),),
+    ) as executor:
+        return list(
+            executor.map(
+                _convert_csv,
+                csv_files,
+                fragments,
+                repeat(drop_columns),
+                repeat(sort_by),
+                repeat(scan_csv_kwargs),
+            )
+        )
+
+
+def scan_fragments(fragments: list[Path]) -> pl.LazyFrame:
+    """
+    Scan parquet fragments as a single lazy frame, reconciling their schemas.
+
+    Columns missing from some fragments are filled with nulls and columns with
+    different types in different fragments get a common type (e.g. `Int64` and
+    `Float64` become `Float64`, a number and a text become `String`).
+    """
+    import polars as pl
+
+    return pl.concat(
+        [pl.scan_parquet(fragment) for fragment in fragments], how="diagonal_relaxed"
+    )
+
+
+def order_fragments(fragments: list[Path], sort_by) -> list[Path] | None:
+    """
+    Order fragments sorted by `sort_by` so that their concatenation is sorted.
+
+    This works when no two fragments share a value of the first `sort_by`
+    column, e.g. one csv file per state for data sorted by state: each
+    fragment is then sorted on its own (see `convert_csvs`) instead of the
+    whole table at once. Only the min/max of that column are read.
+
+    Args:
+        fragments: Paths of the fragments, each sorted by `sort_by`
+        sort_by: Columns the fragments are sorted by
+
+    Returns:
+        The fragments in order, or None if their values of the first column
+        overlap (or have nulls), when the table must be sorted as a whole
+    """
+    import polars as pl
+
+    column = sort_by[0]
+    empty, ranges = [], []
+    for fragment in fragments:
+        low, high, nulls = (
+            pl.scan_parquet(fragment)
+            .select(
+                pl.col(column).min().alias("low"),
+                pl.col(column).max().alias("high"),
+                pl.col(column).null_count().alias("nulls"),
+            )
+            .collect()
+            .row(0)
+        )
+        if nulls:
+            return None
+        if low is None:  # empty fragments can go anywhere
+            empty.append(fragment)
+        else:
+            ranges.append((low, high, fragment))
+    try:
+        ranges.sort(key=lambda item: item[0])
+    except TypeError:  # different types in different fragments
+        return None
+    if any(high >= low for (_, high, _), (low, _, _) in zip(ranges, ranges[1:])):
+        return None
+    return empty + [fragment for _, _, fragment in ranges]
+
+
+def update_fragments(
+    csv_files: list[Path],
+    build_dir: Path,
+    drop_columns=None,
+    max_workers: int | None = None,
+    sort_by=None,
+    **scan_csv_kwargs,
+) -> list[Path]:
+    """
+    Convert csv files to parquet fragments, reusing the ones of unchanged files.
+
+    The build manifest (`build.json` in `build_dir`) records, for each csv
+    file, its size, modification time and SHA-256 and the fragment converted
+    from it. Only new or changed files are converted again (all of them if the
+    conversion arguments change), by `convert_csvs`, and the fragments of the
+    files that are gone are removed. A file with a new modification time but
+    the same content is not converted again.
+
+    Args:
+        csv_files: Paths of the csv files (with distinct names)
+        build_dir: Directory for the fragments and the build manifest, kept
+            between builds
+        drop_columns: Columns to drop (e.g. personal information)
+        max_workers: Maximum number of files converted at the same time
+        sort_by: Columns to sort each fragment by
+        **scan_csv_kwargs: Arguments to `polars.scan_csv`
+
+    Returns:
+        Paths of the fragments, in the order of the csv files
+    """
+    build_dir = Path(build_dir)
+    build_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = build_dir / BUILD_MANIFEST_FILENAME
+    # as stored in the manifest (e.g. tuples become lists)
+    options = json.loads(
+        json.dumps(
+            {"drop_columns": drop_columns, "sort_by": sort_by, **scan_csv_kwargs},
+            default=str,
+        )
+    )
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        manifest = {}
+    previous = manifest.get("files", {})
+    reusable = previous if manifest.get("options") == options else {}
+
+    csv_files = [Path(csv_file) for csv_file in csv_files]
+    entries, changed = {}, []
+    for csv_file in csv_files:
+        stat = csv_file.stat()
+        entry = reusable.get(csv_file.name)
+        if entry and (build_dir / entry["fragment"]).exists():
+            if (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                entries[csv_file.name] = entry
+                continue
+            sha256 = file_sha256(csv_file)
+            if (entry["size"], entry["sha256"]) == (stat.st_size, sha256):
+                entries[csv_file.name] = {**entry, "mtime_ns": stat.st_mtime_ns}
+                continue
+        else:
+            sha256 = file_sha256(csv_file)
+        changed.append(csv_file)
+        entries[csv_file.name] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "fragment": f"{csv_file.stem}.parquet",
+        }
+
+    convert_csvs(
+        changed, build_dir, drop_columns, max_workers, sort_by, **scan_csv_kwargs
+    )
+    current = {entry["fragment"] for entry in entries.values()}
+    for entry in previous.values():
+        if entry["fragment"] not in current:
+            (build_dir / entry["fragment"]).unlink(missing_ok=True)
+
+    tmp_path = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(
+        json.dumps({"options": options, "files": entries}, indent=2), encoding="utf-8"
+    )
+    os.replace(tmp_path, manifest_path)  # only after all the conversions succeed
+    return [build_dir / entries[csv_file.name]["fragment"] for csv_file in csv_files]
 
 
 def normalize_column_name(text: str) -> str:
@@ -1,29 +1,179 @@
+from __future__ import annotations
+
+import logging
+import shutil
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import partial
 from importlib.resources import files
 from pathlib import Path
-from typing import Literal
+from typing import TYPE_CHECKING, Any, Iterator, Literal
 
-import narwhals as nw
+from cacimbao import cache
+from cacimbao.datasets import get_dataset, list_datasets
+from cacimbao.helpers import (
+    data_files,
+    data_size,
+    download_file,
+    extract_zip,
+    file_sha256,
+    load_datapackage,
+    parse_hash,
+    verify_checksum,
+)
+from cacimbao.parquet import parquet_footer_stats
 
-from cacimbao.datasets import get_dataset
-from cacimbao.helpers import download_and_extract_zip, load_datapackage
+if TYPE_CHECKING:
+    import narwhals as nw
+    import polars as pl
 
-DATASETS_DIR = Path.home() / "cacimbao"
-DATASETS_DIR.mkdir(parents=True, exist_ok=True)
+logger = logging.getLogger(__name__)
 
+# bytes per value in memory, used to estimate the size of a loaded dataset;
+# other types take 8 bytes, and strings and nested types are counted as
+# 16-byte views (for strings, the size of their data in the file is a floor)
+DTYPE_WIDTHS = {
+    "Boolean": 1,
+    "Int8": 1,
+    "UInt8": 1,
+    "Int16": 2,
+    "UInt16": 2,
+    "Int32": 4,
+    "UInt32": 4,
+    "Float32": 4,
+    "Date": 4,
+    "Categorical": 4,  # UInt32 codes
+    "Int128": 16,
+    "String": 16,
+    "Binary": 16,
+    "List": 16,
+    "Array": 16,
+    "Struct": 16,
+}
 
-def download_dataset(
-    name: str, df_format: Literal["polars", "pandas"] = "polars"
-) -> nw.DataFrame:
+
+# one lock per remote dataset: its downloads share the staging paths in the
+# cache directory, so they must not run at the same time (threads, tasks or
+# other processes using the same cache directory)
+_download_locks: dict[str, threading.Lock] = {}
+_download_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _download_lock(cache_dir: Path, name: str):
+    with _download_locks_guard:
+        lock = _download_locks.setdefault(name, threading.Lock())
+    with lock, cache.file_lock(cache.dataset_lock_path(cache_dir, name)):
+        yield
+
+
+def _matches_datapackage(file_path: Path, sha256: str, datapackage: dict) -> bool:
+    """Check a downloaded file against the `hash` (and `bytes`) of its datapackage.
+
+    The SHA-256 checksum already computed for the manifest is reused, so the
+    file is only read again if the datapackage uses another algorithm.
     """
-    Download and load a dataset.
+    expected_bytes = datapackage.get("bytes")
+    if expected_bytes is not None and file_path.stat().st_size != expected_bytes:
+        return False
+    algorithm, digest = parse_hash(datapackage["hash"])
+    if algorithm == "sha256":
+        return sha256 == digest
+    return verify_checksum(file_path, datapackage["hash"])
+
+
+def _download_remote_dataset(name: str, download_url: str) -> Path:
+    """Download a remote dataset to the cache and record it in the manifest.
+
+    If the dataset is cached, the download is conditional on the stored
+    `ETag` / `Last-Modified` validators: an unchanged dataset costs a single
+    304 response and the cached version is kept.
+
+    The zip file is extracted to a staging directory that replaces the cached
+    dataset only after a successful download, so a failure never destroys a
+    previously cached version.
+    """
+    cache_dir = cache.get_cache_dir()
+    validators = {}
+    cached_file_path = cache.cached_filepath(cache_dir, name, download_url)
+    if cached_file_path is not None:
+        entry = cache.get_entry(cache_dir, name)
+        validators = {
+            "etag": entry.get("etag"),
+            "last_modified": entry.get("last_modified"),
+        }
+
+    dataset_dir = cache_dir / name
+    staging_dir = cache_dir / f".{name}.download"
+    # kept outside the staging directory, so an interrupted download can resume
+    zip_filepath = cache_dir / f".{name}.zip"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    validators = download_file(download_url, zip_filepath, **validators)
+    if validators is None:  # not modified
+        cache.update_entry(cache_dir, name)
+        return cached_file_path
+
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    try:
+        extract_zip(zip_filepath, staging_dir)
+    finally:
+        zip_filepath.unlink()
+
+    # load the datapackage.json to get the correct filename
+    datapackage = load_datapackage(staging_dir / "datapackage.json")
+    filename = datapackage["path"]
+
+    sha256 = file_sha256(staging_dir / filename)
+    if "hash" in datapackage and not _matches_datapackage(
+        staging_dir / filename, sha256, datapackage
+    ):
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise ValueError(
+            f"O arquivo da base de dados '{name}' está corrompido: o checksum "
+            "não confere com o do datapackage.json. Tente baixá-la novamente."
+        )
+
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+    staging_dir.rename(dataset_dir)
+
+    file_path = dataset_dir / filename
+    now = datetime.now(timezone.utc).isoformat()
+    cache.update_entry(
+        cache_dir,
+        name,
+        url=download_url,
+        path=filename,
+        size=data_size(file_path),
+        sha256=sha256,
+        last_accessed=now,
+        **validators,
+    )
+    cache.cache_prune(keep=(name,))  # only if a maximum size is configured
+    return file_path
+
+
+def _resolve_filepath(name: str, refresh: bool = False, offline: bool = False) -> Path:
+    """
+    Resolve the path of the data file of a dataset, downloading it if needed.
 
     Args:
-        name: Name of the dataset to download
-        df_format: Format of the returned dataframe ("polars" or "pandas")
+        name: Name of the dataset
+        refresh: If True, check if a newer version of a cached remote dataset
+            is available (conditional request) and download it
+        offline: If True, never download; fail if a remote dataset is not cached
 
     Returns:
-        DataFrame in the specified format
+        Path to the data file (parquet or csv)
     """
+    if refresh and offline:
+        raise ValueError("Os modos 'refresh' e 'offline' não podem ser usados juntos.")
+
     dataset_info = get_dataset(name)
 
     if dataset_info.local:
@@ -31,16 +181,85 @@ def download_dataset(
 
         if not file_path.exists():
             raise FileNotFoundError(f"Local dataset '{name}' not found at {file_path}")
+        return Path(str(file_path))
+
+    cache_dir = cache.get_cache_dir()
+    if offline:
+        # any cached version is accepted, even if it is not the latest one
+        file_path = cache.cached_filepath(cache_dir, name)
+        if file_path is None:
+            raise FileNotFoundError(
+                f"Base de dados '{name}' não encontrada no cache ({cache_dir}). "
+                "Baixe-a antes de usar o modo offline."
+            )
+    elif refresh:
+        with _download_lock(cache_dir, name):
+            file_path = _download_remote_dataset(name, dataset_info.download_url)
     else:
-        file_path = DATASETS_DIR / name
-        file_path = download_and_extract_zip(dataset_info.download_url, file_path)
+        # checked under the lock: a concurrent download may have just finished
+        with _download_lock(cache_dir, name):
+            file_path = cache.cached_filepath(
+                cache_dir, name, dataset_info.download_url
+            )
+            if file_path is None:
+                return _download_remote_dataset(name, dataset_info.download_url)
+
+    cache.touch_entry(cache_dir, name)
+    return file_path
+
+
+def _filters_expression(filters: dict) -> pl.Expr:
+    """Build a predicate from `{column: value}` or `{column: [values]}` filters."""
+    import polars as pl
 
-        # load the datapackage.json to get the correct filename
-        datapackage = load_datapackage(file_path / "datapackage.json")
-        filename = datapackage["path"]
-        file_path = file_path / filename
+    predicates = []
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple, set, frozenset)):
+            predicates.append(pl.col(column).is_in(list(value)))
+        else:
+            predicates.append(pl.col(column) == value)
+    return pl.all_horizontal(predicates)
 
-    if file_path.suffix == ".csv":
+
+def _freeze(value):
+    """Turn columns and filters into hashable values to be used in cache keys."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(value, key=repr))
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    return value
+
+
+def _scan_file(file_path: Path) -> pl.LazyFrame:
+    import polars as pl
+
+    if file_path.is_dir():  # partitioned: filters on the keys skip whole files
+        return pl.scan_parquet(file_path, hive_partitioning=True)
+    elif file_path.suffix == ".csv":
+        return pl.scan_csv(file_path)
+    elif file_path.suffix == ".parquet":
+        return pl.scan_parquet(file_path)
+    raise ValueError(f"Formato de arquivo não suportado: {file_path.suffix}")
+
+
+def _read_file(
+    file_path: Path,
+    df_format: Literal["polars", "pandas"],
+    columns: list[str] | None = None,
+    filters: dict | None = None,
+):
+    import narwhals as nw
+
+    if columns or filters or file_path.is_dir():
+        lf = _scan_file(file_path)
+        if filters:
+            lf = lf.filter(_filters_expression(filters))
+        if columns:
+            lf = lf.select(columns)
+        df = nw.from_native(lf).collect(backend=df_format)
+    elif file_path.suffix == ".csv":
         df = nw.read_csv(file_path, backend=df_format)
     elif file_path.suffix == ".parquet":
         df = nw.read_parquet(file_path, backend=df_format)
@@ -52,10 +271,507 @@ def download_dataset(
     return df.to_polars()
 
 
+def download_dataset(
+    name: str,
+    df_format: Literal["polars", "pandas"] = "polars",
+    columns: list[str] | None = None,
+    filters: dict | None = None,
+    refresh: bool = False,
+    offline: bool = False,
+) -> nw.DataFrame:
+    """
+    Download and load a dataset.
+
+    Remote datasets are cached (see `cacimbao.get_cache_dir`) and only downloaded again
+    when their download URL changes or, with `refresh=True`, when the server
+    reports a newer version. If the in-memory cache is enabled (see
+    `cacimbao.enable_memory_cache`), the loaded dataframe is also kept in memory.
+
+    Column selections and filters are pushed down to the parquet reader, so
+    only the required columns and row groups are read.
+
+    Args:
+        name: Name of the dataset to download
+        df_format: Format of the returned dataframe ("polars" or "pandas")
+        columns: Columns to be loaded (all columns if None)
+        filters: Rows to be loaded, as `{column: value}` or
+            `{column: [values]}` (e.g. `{"uf": ["BA", "SE"]}`)
+        refresh: If True, check for a newer version of the cached dataset
+        offline: If True, only use the cached dataset (no network access)
+
+    Returns:
+        DataFrame in the specified format
+    """
+    file_path = _resolve_filepath(name, refresh, offline)
+    return _load_file(name, file_path, df_format, columns, filters)
+
+
+def _load_file(
+    name: str,
+    file_path: Path,
+    df_format: Literal["polars", "pandas"],
+    columns: list[str] | None = None,
+    filters: dict | None = None,
+):
+    """Read the data file of a dataset, through the in-memory cache if enabled."""
+    memory_cache = cache.get_memory_cache()
+    if memory_cache is None:
+        return _read_file(file_path, df_format, columns, filters)
+
+    stat = file_path.stat()  # a new version of the file is a new entry
+    key = (
+        name,
+        str(file_path),
+        stat.st_mtime_ns,
+        stat.st_size,
+        df_format,
+        _freeze(columns),
+        _freeze(filters),
+    )
+    df = memory_cache.get(key)
+    if df is None:
+        df = _read_file(file_path, df_format, columns, filters)
+        memory_cache.put(key, df)
+    # cached frames are shared: callers get their own (cheap for polars) copy
+    if df_format == "pandas":
+        return df.copy()
+    return df.clone()
+
+
 def load_dataset(
-    name: str, df_format: Literal["polars", "pandas"] = "polars"
+    name: str,
+    df_format: Literal["polars", "pandas"] = "polars",
+    columns: list[str] | None = None,
+    filters: dict | None = None,
+    refresh: bool = False,
+    offline: bool = False,
 ) -> nw.DataFrame:
     """
     Alias for download_dataset to sign the intent of loading a local dataset.
     """
-    return download_dataset(name, df_format)
+    return download_dataset(
+        name,
+        df_format,
+        columns=columns,
+        filters=filters,
+        refresh=refresh,
+        offline=offline,
+    )
+
+
+# work in progress per event loop, so concurrent awaits share the same work
+_pending_loads: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+async def _shared_work(key: tuple, func, *args):
+    """Run `func` in a thread, sharing it with concurrent awaits of the same key."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    pending = _pending_loads.setdefault(loop, {})
+    task = pending.get(key)
+    if task is None:
+        task = loop.create_task(asyncio.to_thread(func, *args))
+        pending[key] = task
+        task.add_done_callback(lambda _: pending.pop(key, None))
+    # shielded: cancelling one of the awaits does not cancel the shared work
+    return await asyncio.shield(task)
+
+
+async def adownload_dataset(
+    name: str,
+    df_format: Literal["polars", "pandas"] = "polars",
+    columns: list[str] | None = None,
+    filters: dict | None = None,
+    refresh: bool = False,
+    offline: bool = False,
+) -> nw.DataFrame:
+    """
+    Asynchronous version of `download_dataset`.
+
+    The download and the decoding of the file run in a thread, so the event
+    loop is not blocked. Concurrent awaits on the same dataset share a single
+    download, and a single read if they also ask for the same columns, filters
+    and format.
+
+    Args:
+        name: Name of the dataset to download
+        df_format: Format of the returned dataframe ("polars" or "pandas")
+        columns: Columns to be loaded (all columns if None)
+        filters: Rows to be loaded, as `{column: value}` or `{column: [values]}`
+        refresh: If True, check for a newer version of the cached dataset
+        offline: If True, only use the cached dataset (no network access)
+
+    Returns:
+        DataFrame in the specified format
+    """
+    file_path = await _shared_work(
+        ("resolve", name, refresh, offline),
+        _resolve_filepath,
+        name,
+        refresh,
+        offline,
+    )
+    df = await _shared_work(
+        ("load", name, str(file_path), df_format, _freeze(columns), _freeze(filters)),
+        _load_file,
+        name,
+        file_path,
+        df_format,
+        columns,
+        filters,
+    )
+    if df_format == "pandas":
+        return df.copy()  # pandas dataframes are mutable, do not share them
+    return df
+
+
+async def aload_dataset(
+    name: str,
+    df_format: Literal["polars", "pandas"] = "polars",
+    columns: list[str] | None = None,
+    filters: dict | None = None,
+    refresh: bool = False,
+    offline: bool = False,
+) -> nw.DataFrame:
+    """
+    Alias for adownload_dataset to sign the intent of loading a local dataset.
+    """
+    return await adownload_dataset(
+        name,
+        df_format,
+        columns=columns,
+        filters=filters,
+        refresh=refresh,
+        offline=offline,
+    )
+
+
+def scan_dataset(
+    name: str, refresh: bool = False, offline: bool = False
+) -> pl.LazyFrame:
+    """
+    Lazily scan a dataset without loading it into memory.
+
+    Column selections and filters applied to the returned LazyFrame are pushed
+    down to the file reader, so only the required data is read on `collect()`.
+
+    Args:
+        name: Name of the dataset to scan
+        refresh: If True, check for a newer version of the cached dataset
+        offline: If True, only use the cached dataset (no network access)
+
+    Returns:
+        Polars LazyFrame over the dataset file
+    """
+    file_path = _resolve_filepath(name, refresh, offline)
+    return _scan_file(file_path)
+
+
+def iter_batches(
+    name: str,
+    batch_size: int = 100_000,
+    columns: list[str] | None = None,
+    df_format: Literal["polars", "pandas"] = "polars",
+    refresh: bool = False,
+    offline: bool = False,
+) -> Iterator:
+    """
+    Iterate over a dataset in batches of at most `batch_size` rows.
+
+    Each batch is read with a slice pushed down to the parquet reader, which
+    only decodes the row groups that overlap the batch. The memory usage
+    depends on `batch_size` (and on the row group size), not on the size of
+    the dataset.
+
+    Args:
+        name: Name of the dataset
+        batch_size: Maximum number of rows per batch
+        columns: Columns to be loaded (all columns if None)
+        df_format: Format of the yielded dataframes ("polars" or "pandas")
+        refresh: If True, check for a newer version of the cached dataset
+        offline: If True, only use the cached dataset (no network access)
+
+    Yields:
+        DataFrames in the specified format
+    """
+    import narwhals as nw
+    import polars as pl
+
+    if batch_size < 1:
+        raise ValueError("O tamanho do lote (batch_size) deve ser maior que zero.")
+
+    lf = scan_dataset(name, refresh, offline)
+    if columns:
+        lf = lf.select(columns)
+    total_rows = lf.select(pl.len()).collect().item()  # read from the metadata
+
+    for offset in range(0, total_rows, batch_size):
+        batch = lf.slice(offset, batch_size).collect()
+        if df_format == "pandas":
+            yield nw.from_native(batch).to_pandas()
+        else:
+            yield batch
+
+
+def _dtype_width(dtype) -> int:
+    return DTYPE_WIDTHS.get(dtype.base_type().__name__, 8)
+
+
+def _column_memory_size(dtype, rows: int, file_size: int) -> int:
+    size = rows * _dtype_width(dtype)
+    if dtype.base_type().__name__ in ("String", "Binary"):
+        # long values are stored out of the views: at least as much data as
+        # in the uncompressed pages of the file
+        return max(size, file_size)
+    return size
+
+
+def _file_stats(file_path: Path) -> dict:
+    """Compute (or reuse the cached) statistics of a data file."""
+    cache_dir = cache.get_cache_dir()
+    stats = cache.get_file_stats(cache_dir, file_path)
+    if stats is not None:
+        return stats
+
+    mtime_ns, file_size = cache.data_signature(file_path)
+    stats = {"file_size": file_size, "mtime_ns": mtime_ns}
+    if file_path.suffix == ".parquet" or file_path.is_dir():
+        # a partitioned dataset is described by the footers of all its files
+        footers = [parquet_footer_stats(path) for path in data_files(file_path)]
+        schema = _scan_file(file_path).collect_schema()  # also read from footers
+        rows = sum(footer["rows"] for footer in footers)
+        column_sizes = Counter()
+        for footer in footers:
+            column_sizes.update(footer["column_sizes"])
+        stats.update(
+            rows=rows,
+            columns=len(schema),
+            row_groups=sum(footer["row_groups"] for footer in footers),
+            estimated_memory_size=sum(
+                _column_memory_size(dtype, rows, column_sizes[column])
+                for column, dtype in schema.items()
+            ),
+            schema={column: str(dtype) for column, dtype in schema.items()},
+        )
+    cache.save_file_stats(cache_dir, file_path, stats)
+    return stats
+
+
+def dataset_stats(name: str, download: bool = False) -> dict | None:
+    """
+    Describe the data file of a dataset without loading it.
+
+    Everything is read from the parquet footer, so no data is decoded. The
+    statistics are stored in the cache directory and computed again only when
+    the data file changes (e.g. a new version written by `prepare`).
+
+    Args:
+        name: Name of the dataset
+        download: If True, download a remote dataset that is not cached yet
+
+    Returns:
+        Dictionary with the path, the number of rows, columns and row groups,
+        the size on disk (`file_size`) and estimated size in memory
+        (`estimated_memory_size`), in bytes, and the schema (`{column: dtype}`).
+        None if the dataset is remote, not cached and `download` is False.
+    """
+    if not download and not get_dataset(name).local:
+        if cache.cached_filepath(cache.get_cache_dir(), name) is None:
+            return None
+    file_path = _resolve_filepath(name, offline=not download)
+
+    stats = _file_stats(file_path)
+    return {
+        "name": name,
+        "path": str(file_path),
+        **{key: value for key, value in stats.items() if key != "mtime_ns"},
+    }
+
+
+def datasets_manifest(
+    names: list[str] | None = None, download: bool = False
+) -> dict[str, dict | None]:
+    """
+    Describe several datasets without loading them (see `dataset_stats`).
+
+    Args:
+        names: Names of the datasets (all available datasets if None)
+        download: If True, download the remote datasets that are not cached yet
+
+    Returns:
+        Dictionary with the statistics of each dataset name (None for remote
+        datasets that are not cached, unless `download` is True)
+    """
+    if names is None:
+        names = list_datasets()
+    return {name: dataset_stats(name, download) for name in names}
+
+
+def _expected_checksum(name: str, file_path: Path) -> tuple[str, int | None]:
+    """Return the recorded checksum (and size) of the data file of a dataset.
+
+    The `hash` of the datapackage.json next to the file is used if present;
+    for remote datasets, the checksum recorded in the cache manifest otherwise.
+    """
+    datapackage_path = file_path.parent / "datapackage.json"
+    if datapackage_path.is_file():
+        datapackage = load_datapackage(datapackage_path)
+        if "hash" in datapackage:
+            return datapackage["hash"], datapackage.get("bytes")
+    entry = cache.get_entry(cache.get_cache_dir(), name)
+    if not get_dataset(name).local and entry and entry.get("sha256"):
+        return f"sha256:{entry['sha256']}", entry.get("size")
+    raise ValueError(f"Não há checksum registrado para a base de dados '{name}'.")
+
+
+def verify_dataset(name: str, use_mmap: bool = False) -> bool:
+    """
+    Check that the data file of a dataset is intact, without loading it.
+
+    The file is hashed in fixed-size chunks and compared to the checksum in its
+    datapackage.json (or, for remote datasets, the one recorded when it was
+    downloaded). Remote datasets are never downloaded.
+
+    Args:
+        name: Name of the dataset
+        use_mmap: If True, hash the memory-mapped file instead of reading it
+
+    Returns:
+        True if the file matches its checksum, False if it is corrupted
+    """
+    if get_dataset(name).local:
+        file_path = _resolve_filepath(name)
+    else:
+        # not `cached_filepath`, which ignores files of the wrong size
+        cache_dir = cache.get_cache_dir()
+        entry = cache.get_entry(cache_dir, name)
+        file_path = cache_dir / name / entry["path"] if entry else None
+        if file_path is None or not file_path.exists():
+            raise FileNotFoundError(
+                f"Base de dados '{name}' não encontrada no cache ({cache_dir})."
+            )
+    expected_hash, expected_bytes = _expected_checksum(name, file_path)
+    intact = verify_checksum(
+        file_path, expected_hash, expected_bytes, use_mmap=use_mmap
+    )
+    if not intact:
+        logger.warning("O checksum da base de dados '%s' não confere", name)
+    return intact
+
+
+def verify_datasets(
+    names: list[str] | None = None,
+    max_workers: int | None = None,
+    use_mmap: bool = False,
+) -> dict[str, bool]:
+    """
+    Check several datasets at once, hashing their files in parallel.
+
+    Args:
+        names: Names of the datasets (all local and cached remote datasets if None)
+        max_workers: Maximum number of files hashed at the same time
+        use_mmap: If True, hash the memory-mapped files instead of reading them
+
+    Returns:
+        Dictionary telling, for each dataset name, if its file is intact
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if names is None:
+        cache_dir = cache.get_cache_dir()
+        names = [
+            name
+            for name in list_datasets()
+            if get_dataset(name).local or cache.get_entry(cache_dir, name)
+        ]
+    names = list(dict.fromkeys(names))
+
+    # hashlib releases the GIL while hashing, so threads hash files in parallel
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(partial(verify_dataset, use_mmap=use_mmap), names)
+        return dict(zip(names, results))
+
+
+@dataclass
+class DownloadResult:
+    """Outcome of downloading one dataset with `download_datasets`."""
+
+    name: str
+    elapsed: float  # seconds
+    dataframe: Any = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _timed_download(
+    name: str,
+    df_format: Literal["polars", "pandas"],
+    return_frames: bool,
+    refresh: bool,
+    offline: bool,
+) -> DownloadResult:
+    start = time.perf_counter()
+    try:
+        if return_frames:
+            dataframe = download_dataset(
+                name, df_format, refresh=refresh, offline=offline
+            )
+        else:
+            _resolve_filepath(name, refresh, offline)
+            dataframe = None
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        logger.warning("Falha ao baixar '%s' (%.2fs): %s", name, elapsed, e)
+        return DownloadResult(name, elapsed, error=e)
+    elapsed = time.perf_counter() - start
+    logger.info("Base de dados '%s' pronta em %.2fs", name, elapsed)
+    return DownloadResult(name, elapsed, dataframe=dataframe)
+
+
+def download_datasets(
+    names: list[str] | None = None,
+    max_workers: int | None = None,
+    df_format: Literal["polars", "pandas"] = "polars",
+    return_frames: bool = False,
+    refresh: bool = False,
+    offline: bool = False,
+) -> dict[str, DownloadResult]:
+    """
+    Download and prepare several datasets at once, using a thread pool.
+
+    A failure in one dataset does not abort the others: it is reported in the
+    `error` attribute of its result.
+
+    Args:
+        names: Names of the datasets (all available datasets if None)
+        max_workers: Maximum number of datasets handled at the same time
+        df_format: Format of the returned dataframes ("polars" or "pandas")
+        return_frames: If True, load the datasets and return their dataframes
+        refresh: If True, check for newer versions of the cached datasets
+        offline: If True, only use the cached datasets (no network access)
+
+    Returns:
+        Dictionary with a `DownloadResult` for each dataset name
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if names is None:
+        names = list_datasets()
+    names = list(dict.fromkeys(names))  # each dataset is handled only once
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            partial(
+                _timed_download,
+                df_format=df_format,
+                return_frames=return_frames,
+                refresh=refresh,
+                offline=offline,
+            ),
+            names,
+        )
+        return {result.name: result for result in results}
@@ -0,0 +1,176 @@
+"""Read the metadata of parquet files from their footer, without reading any data.
+
+The footer of a parquet file is a `FileMetaData` structure serialized with the
+Thrift compact protocol, followed by its length (4 bytes) and the `PAR1`
+magic number. Only a handful of its fields are needed here, so it is decoded
+with the small reader below instead of an extra dependency.
+"""
+
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from typing import Any
+
+MAGIC = b"PAR1"
+FOOTER_TAIL_SIZE = 8  # footer length (4 bytes) + magic number (4 bytes)
+
+# Thrift compact protocol types
+_BOOLEAN_TRUE = 1
+_BOOLEAN_FALSE = 2
+_BYTE = 3
+_I16 = 4
+_I32 = 5
+_I64 = 6
+_DOUBLE = 7
+_BINARY = 8
+_LIST = 9
+_SET = 10
+_MAP = 11
+_STRUCT = 12
+
+# field ids of the parquet.thrift structures that are used
+_FILE_METADATA_SCHEMA = 2
+_FILE_METADATA_NUM_ROWS = 3
+_FILE_METADATA_ROW_GROUPS = 4
+_SCHEMA_ELEMENT_NUM_CHILDREN = 5
+_ROW_GROUP_COLUMNS = 1
+_ROW_GROUP_TOTAL_BYTE_SIZE = 2
+_ROW_GROUP_TOTAL_COMPRESSED_SIZE = 6
+_COLUMN_CHUNK_META_DATA = 3
+_COLUMN_META_DATA_PATH_IN_SCHEMA = 3
+_COLUMN_META_DATA_TOTAL_UNCOMPRESSED_SIZE = 6
+
+
+class _CompactReader:
+    """Decode Thrift compact protocol structures as `{field_id: value}` dicts."""
+
+    def __init__(self, buffer: bytes):
+        self.buffer = buffer
+        self.pos = 0
+
+    def _byte(self) -> int:
+        value = self.buffer[self.pos]
+        self.pos += 1
+        return value
+
+    def _varint(self) -> int:
+        result = shift = 0
+        while True:
+            byte = self._byte()
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def _zigzag(self) -> int:
+        value = self._varint()
+        return (value >> 1) ^ -(value & 1)
+
+    def _value(self, type_id: int) -> Any:
+        if type_id == _BOOLEAN_TRUE:
+            return True
+        if type_id == _BOOLEAN_FALSE:
+            return False
+        if type_id == _BYTE:
+            return self._byte()
+        if type_id in (_I16, _I32, _I64):
+            return self._zigzag()
+        if type_id == _DOUBLE:
+            (value,) = struct.unpack_from("<d", self.buffer, self.pos)
+            self.pos += 8
+            return value
+        if type_id == _BINARY:
+            size = self._varint()
+            value = self.buffer[self.pos : self.pos + size]
+            self.pos += size
+            return value
+        if type_id in (_LIST, _SET):
+            header = self._byte()
+            size = header >> 4
+            if size == 15:
+                size = self._varint()
+            element_type = header & 0x0F
+            if element_type in (_BOOLEAN_TRUE, _BOOLEAN_FALSE):
+                return [self._byte() == _BOOLEAN_TRUE for _ in range(size)]
+            return [self._value(element_type) for _ in range(size)]
+        if type_id == _MAP:
+            size = self._varint()
+            if not size:
+                return {}
+            types = self._byte()
+            return {
+                self._value(types >> 4): self._value(types & 0x0F) for _ in range(size)
+            }
+        if type_id == _STRUCT:
+            return self.struct()
+        raise ValueError(f"Tipo Thrift desconhecido: {type_id}")
+
+    def struct(self) -> dict[int, Any]:
+        fields = {}
+        field_id = 0
+        while True:
+            header = self._byte()
+            if header == 0:  # stop
+                return fields
+            delta, type_id = header >> 4, header & 0x0F
+            field_id = field_id + delta if delta else self._zigzag()
+            fields[field_id] = self._value(type_id)
+
+
+def _read_footer(filepath: Path) -> bytes:
+    with open(filepath, "rb") as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        if file_size < len(MAGIC) + FOOTER_TAIL_SIZE:
+            raise ValueError("arquivo pequeno demais")
+        f.seek(file_size - FOOTER_TAIL_SIZE)
+        tail = f.read(FOOTER_TAIL_SIZE)
+        (footer_size,) = struct.unpack("<I", tail[:4])
+        if tail[4:] != MAGIC or footer_size > file_size - FOOTER_TAIL_SIZE:
+            raise ValueError("rodapé não encontrado")
+        f.seek(file_size - FOOTER_TAIL_SIZE - footer_size)
+        return f.read(footer_size)
+
+
+def parquet_footer_stats(filepath: Path) -> dict:
+    """
+    Read the size of a parquet file from its footer, without reading any data.
+
+    Args:
+        filepath: Path to the parquet file
+
+    Returns:
+        Dictionary with the number of rows, columns (top-level) and row groups,
+        the compressed and uncompressed size (in bytes) of the data, and the
+        uncompressed size of each top-level column (`column_sizes`)
+    """
+    try:
+        metadata = _CompactReader(_read_footer(filepath)).struct()
+        row_groups = metadata.get(_FILE_METADATA_ROW_GROUPS, [])
+        root = metadata[_FILE_METADATA_SCHEMA][0]
+        column_sizes: dict[str, int] = {}
+        for row_group in row_groups:
+            for chunk in row_group.get(_ROW_GROUP_COLUMNS, []):
+                chunk_metadata = chunk[_COLUMN_CHUNK_META_DATA]
+                column = chunk_metadata[_COLUMN_META_DATA_PATH_IN_SCHEMA][0].decode()
+                column_sizes[column] = (
+                    column_sizes.get(column, 0)
+                    + chunk_metadata[_COLUMN_META_DATA_TOTAL_UNCOMPRESSED_SIZE]
+                )
+        return {
+            "rows": metadata[_FILE_METADATA_NUM_ROWS],
+            "columns": root.get(_SCHEMA_ELEMENT_NUM_CHILDREN, 0),
+            "row_groups": len(row_groups),
+            "compressed_size": sum(
+                row_group.get(_ROW_GROUP_TOTAL_COMPRESSED_SIZE, 0)
+                for row_group in row_groups
+            ),
+            "uncompressed_size": sum(
+                row_group[_ROW_GROUP_TOTAL_BYTE_SIZE] for row_group in row_groups
+            ),
+            "column_sizes": column_sizes,
+        }
+    except (IndexError, KeyError, TypeError, ValueError, struct.error) as e:
+        # a corrupted footer decodes to garbage (or not at all)
+        raise ValueError(f"Arquivo parquet inválido: {filepath} ({e})") from e
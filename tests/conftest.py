@@ -0,0 +1,89 @@
+import functools
+import re
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+
+class DatasetHTTPRequestHandler(SimpleHTTPRequestHandler):
+    """Serve static files with ETag and Range support, recording every request.
+
+    `SimpleHTTPRequestHandler` already answers `If-Modified-Since` with 304.
+    """
+
+    def send_head(self):
+        self.server.requests.append(dict(self.headers))
+        if self.server.failures.get(self.path, 0) > 0:
+            self.server.failures[self.path] -= 1
+            self.send_error(503)
+            return None
+        path = Path(self.translate_path(self.path))
+        self.etag = None
+        if path.is_file():
+            stat = path.stat()
+            self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if self.headers.get("If-None-Match") == self.etag:
+                self.send_response(304)
+                self.end_headers()
+                return None
+            range_match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+            if range_match and self.headers.get("If-Range") in (None, self.etag):
+                return self._send_partial_content(path, int(range_match.group(1)))
+        return super().send_head()
+
+    def _send_partial_content(self, path, start):
+        size = path.stat().st_size
+        if start >= size:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return None
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.send_header("Content-Length", str(size - start))
+        self.end_headers()
+        return f
+
+    def end_headers(self):
+        if getattr(self, "etag", None):
+            self.send_header("ETag", self.etag)
+        super().end_headers()
+
+    def log_request(self, code="-", size="-"):
+        self.server.status_codes.append(int(code))
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """Serve the files of a temporary directory over HTTP.
+
+    The server has `dir` (the directory being served), `url` (base URL),
+    `requests` (headers of each request) and `status_codes` attributes.
+    Set `failures[path] = n` to answer the next n requests to `path` with 503.
+    """
+    served_dir = tmp_path / "served"
+    served_dir.mkdir()
+    handler = functools.partial(DatasetHTTPRequestHandler, directory=str(served_dir))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.dir = served_dir
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    server.requests = []
+    server.status_codes = []
+    server.failures = {}
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
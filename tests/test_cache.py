@@ -0,0 +1,190 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from cacimbao.cache import (
+    DATASETS_DIR,
+    cache_info,
+    cache_prune,
+    dataset_lock_path,
+    file_lock,
+    get_cache_dir,
+    get_cache_max_size,
+    get_entry,
+    load_manifest,
+    set_cache_dir,
+    set_cache_max_size,
+    update_entry,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_cache_settings(monkeypatch):
+    monkeypatch.delenv("CACIMBAO_CACHE_DIR", raising=False)
+    monkeypatch.delenv("CACIMBAO_CACHE_MAX_SIZE", raising=False)
+    yield
+    set_cache_dir(None)
+    set_cache_max_size(None)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    """Cache directory with three datasets of 100, 200 and 300 bytes."""
+    set_cache_dir(tmp_path)
+    for name, size, last_accessed in [
+        ("pequena", 100, "2025-01-03T00:00:00+00:00"),
+        ("media", 200, "2025-01-01T00:00:00+00:00"),
+        ("grande", 300, "2025-01-02T00:00:00+00:00"),
+    ]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / f"{name}.parquet").write_bytes(b"0" * size)
+        update_entry(
+            tmp_path, name, path=f"{name}.parquet", last_accessed=last_accessed
+        )
+    return tmp_path
+
+
+class TestCacheDir:
+    def test_default_cache_dir(self):
+        assert get_cache_dir() == DATASETS_DIR == Path.home() / "cacimbao"
+
+    def test_cache_dir_from_environment_variable(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("CACIMBAO_CACHE_DIR", str(tmp_path))
+
+        assert get_cache_dir() == tmp_path
+
+    def test_set_cache_dir(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("CACIMBAO_CACHE_DIR", "/outro/lugar")
+
+        set_cache_dir(tmp_path)
+
+        assert get_cache_dir() == tmp_path
+
+
+class TestCacheMaxSize:
+    def test_unlimited_by_default(self):
+        assert get_cache_max_size() is None
+
+    @pytest.mark.parametrize(
+        "size,expected",
+        [
+            ("1048576", 1024**2),
+            ("500M", 500 * 1024**2),
+            ("20GB", 20 * 1024**3),
+            ("1.5k", 1536),
+        ],
+    )
+    def test_max_size_from_environment_variable(self, monkeypatch, size, expected):
+        monkeypatch.setenv("CACIMBAO_CACHE_MAX_SIZE", size)
+
+        assert get_cache_max_size() == expected
+
+    def test_set_cache_max_size(self):
+        set_cache_max_size("2G")
+
+        assert get_cache_max_size() == 2 * 1024**3
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError, match="Tamanho inválido"):
+            set_cache_max_size("muito")
+
+
+class TestCacheInfo:
+    def test_report_disk_usage_and_last_access(self, cache_dir):
+        info = cache_info()
+
+        assert [(dataset["name"], dataset["size"]) for dataset in info] == [
+            ("pequena", 100),
+            ("grande", 300),
+            ("media", 200),
+        ]  # most recently used first
+        assert info[0]["path"] == str(cache_dir / "pequena")
+        assert info[0]["last_accessed"] == "2025-01-03T00:00:00+00:00"
+
+    def test_empty_cache(self, tmp_path):
+        set_cache_dir(tmp_path / "vazio")
+
+        assert cache_info() == []
+
+
+class TestCachePrune:
+    def test_remove_least_recently_used_datasets(self, cache_dir):
+        removed = cache_prune(max_size=300)
+
+        assert removed == ["media", "grande"]
+        assert [dataset["name"] for dataset in cache_info()] == ["pequena"]
+        assert (cache_dir / "media").exists() is False
+        assert get_entry(cache_dir, "media") is None
+
+    def test_keep_datasets(self, cache_dir):
+        removed = cache_prune(max_size=300, keep=("media",))
+
+        assert removed == ["grande"]
+
+    def test_use_configured_max_size(self, cache_dir):
+        set_cache_max_size(500)
+
+        assert cache_prune() == ["media"]
+
+    def test_do_nothing_without_max_size(self, cache_dir):
+        assert cache_prune() == []
+        assert len(cache_info()) == 3
+
+    def test_remove_partial_downloads(self, cache_dir):
+        (cache_dir / ".media.zip.part").write_bytes(b"0")
+
+        cache_prune(max_size=0)
+
+        files = [path for path in cache_dir.iterdir() if path.suffix != ".lock"]
+        assert files == [cache_dir / "manifest.json"]
+
+    def test_skip_datasets_being_downloaded(self, cache_dir):
+        with file_lock(dataset_lock_path(cache_dir, "media")):
+            removed = cache_prune(max_size=300)
+
+        assert removed == ["grande"]
+        assert (cache_dir / "media").exists()
+
+
+def run_python(code: str, *args) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-c", code, *map(str, args)], stderr=subprocess.PIPE
+    )
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="flock is not available")
+class TestFileLock:
+    def test_lock_is_shared_by_processes(self, tmp_path):
+        lock_path = tmp_path / ".lock"
+        code = (
+            "import sys; from pathlib import Path\n"
+            "from cacimbao.cache import file_lock\n"
+            "with file_lock(Path(sys.argv[1]), blocking=False): pass"
+        )
+
+        with file_lock(lock_path):
+            locked = run_python(code, lock_path)
+            _, stderr = locked.communicate()
+        unlocked = run_python(code, lock_path)
+        unlocked.communicate()
+
+        assert locked.returncode != 0
+        assert b"BlockingIOError" in stderr
+        assert unlocked.returncode == 0
+
+    def test_manifest_updates_from_several_processes(self, tmp_path):
+        code = (
+            "import sys; from pathlib import Path\n"
+            "from cacimbao.cache import update_entry\n"
+            "for i in range(20):\n"
+            "    update_entry(Path(sys.argv[1]), f'{sys.argv[2]}-{i}')"
+        )
+
+        processes = [run_python(code, tmp_path, worker) for worker in range(4)]
+        for process in processes:
+            process.communicate()
+
+        assert all(process.returncode == 0 for process in processes)
+        assert len(load_manifest(tmp_path)) == 80
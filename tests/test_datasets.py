@@ -1,12 +1,18 @@
+import hashlib
 import json
 import os
+import sys
+import tempfile
+import zipfile
 from datetime import date
+from importlib.metadata import EntryPoint
 from pathlib import Path
 
 import polars as pl
 import pytest
 from freezegun import freeze_time
 
+from cacimbao import datasets
 from cacimbao.datasets import (
     AldeiasIndigenasDataset,
     FilmografiaBrasileiraDataset,
@@ -15,21 +21,136 @@ from cacimbao.datasets import (
     SalarioMinimoRealVigenteDataset,
     SinPatinhasDataset,
     Size,
+    get_dataset,
     list_datasets,
 )
+from cacimbao.parquet import parquet_footer_stats
 
 
 class TestListDatasets:
+    expected_datasets = [
+        "filmografia_brasileira",
+        "pescadores_e_pescadoras_profissionais",
+        "salario_minimo_real_vigente",
+        "aldeias_indigenas",
+        "pesquisa_nacional_de_saude_2019",
+        "sinpatinhas",
+    ]
+
     def test_list_datasets(self):
-        expected_datasets = [
-            "filmografia_brasileira",
-            "pescadores_e_pescadoras_profissionais",
-            "salario_minimo_real_vigente",
-            "aldeias_indigenas",
-            "pesquisa_nacional_de_saude_2019",
-            "sinpatinhas",
-        ]
-        assert list_datasets() == expected_datasets
+        assert list_datasets() == self.expected_datasets
+
+
+PLUGIN_MODULE = """
+from cacimbao.datasets import BaseDataset, Size
+
+
+class MinhaBaseDataset(BaseDataset):
+    name: str = "minha_base"
+    local: bool = False
+    size: Size = Size.SMALL
+    description: str = "Base de dados de um pacote externo."
+    url: str = "https://example.com/minha-base"
+    download_url: str = "https://example.com/minha-base.zip"
+
+    @classmethod
+    def prepare(cls):
+        pass
+
+
+NOT_A_DATASET = object()
+"""
+
+
+@pytest.fixture
+def plugin(tmp_path, monkeypatch):
+    """Provide `minha_base` through a `cacimbao.datasets` entry point."""
+    (tmp_path / "cacimbao_plugin.py").write_text(PLUGIN_MODULE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "cacimbao_plugin", raising=False)
+    monkeypatch.setattr(datasets, "_registry", dict(datasets._registry))
+    monkeypatch.setattr(datasets, "_entry_points", None)
+    entry_points = [
+        EntryPoint(
+            "minha_base", "cacimbao_plugin:MinhaBaseDataset", datasets.ENTRY_POINT_GROUP
+        ),
+        EntryPoint(
+            "quebrada", "cacimbao_plugin:NOT_A_DATASET", datasets.ENTRY_POINT_GROUP
+        ),
+    ]
+    calls = []
+
+    def fake_entry_points(group):
+        calls.append(group)
+        return [ep for ep in entry_points if ep.group == group]
+
+    monkeypatch.setattr("importlib.metadata.entry_points", fake_entry_points)
+    return calls
+
+
+class TestGetDataset:
+    def test_get_dataset(self):
+        assert get_dataset("sinpatinhas") is SinPatinhasDataset
+
+    def test_unknown_dataset(self):
+        with pytest.raises(ValueError, match="não encontrada"):
+            get_dataset("nao_existe")
+
+    def test_subclasses_are_registered_by_name(self):
+        registered = dict(datasets._registry)
+        try:
+
+            class OutraBaseDataset(SinPatinhasDataset):
+                name: str = "outra_base"
+
+            class SemNomeDataset(SinPatinhasDataset):
+                pass
+
+            assert get_dataset("outra_base") is OutraBaseDataset
+            assert get_dataset("sinpatinhas") is SinPatinhasDataset
+        finally:
+            datasets._registry = registered
+
+
+class TestPluginDatasets:
+    def test_list_datasets_includes_plugins(self, plugin):
+        names = list_datasets()
+
+        assert names[:6] == TestListDatasets.expected_datasets
+        assert names[6:] == ["minha_base", "quebrada"]
+        assert "cacimbao_plugin" not in sys.modules  # only imported on use
+
+    def test_get_dataset_loads_the_plugin_once(self, plugin):
+        dataset = get_dataset("minha_base")
+
+        assert dataset.name == "minha_base"
+        assert issubclass(dataset, datasets.BaseDataset)
+        assert "cacimbao_plugin" in sys.modules
+        assert get_dataset("minha_base") is dataset
+        list_datasets()
+        assert plugin == [datasets.ENTRY_POINT_GROUP]  # discovered only once
+
+    def test_plugin_must_be_a_dataset(self, plugin):
+        with pytest.raises(TypeError, match="não é uma subclasse de BaseDataset"):
+            get_dataset("quebrada")
+
+    def test_plugins_are_not_discovered_for_builtin_datasets(self, plugin):
+        assert get_dataset("filmografia_brasileira") is FilmografiaBrasileiraDataset
+        assert plugin == []
+
+
+@pytest.fixture
+def sort_keys(monkeypatch):
+    """The `sort_by` of each `write_parquet` call."""
+    sort_keys = []
+    write_parquet = datasets.write_parquet
+
+    def spy(data, output_path, **kwargs):
+        sort_keys.append(kwargs["sort_by"])
+        return write_parquet(data, output_path, **kwargs)
+
+    monkeypatch.setattr(datasets, "write_parquet", spy)
+    return sort_keys
 
 
 class TestPesquisaNacionalDeSaude2019Dataset:
@@ -48,6 +169,25 @@ class TestPesquisaNacionalDeSaude2019Dataset:
         os.unlink(PesquisaNacionalDeSaude2019Dataset.new_filepath())
         os.unlink(PesquisaNacionalDeSaude2019Dataset.new_datapackage_filepath())
 
+    @freeze_time("2000-01-01")
+    def test_prepare_data_in_state_order(self, monkeypatch, sort_keys):
+        spill_dirs = []
+        temporary_directory = tempfile.TemporaryDirectory
+
+        def spy(*args, **kwargs):
+            spill_dirs.append(kwargs.get("dir"))
+            return temporary_directory(*args, **kwargs)
+
+        monkeypatch.setattr(tempfile, "TemporaryDirectory", spy)
+
+        PesquisaNacionalDeSaude2019Dataset.prepare("tests/fixtures/sample_pns2019.zip")
+
+        assert sort_keys == [None]  # already in order: not sorted again
+        assert spill_dirs == [PesquisaNacionalDeSaude2019Dataset.dir()]
+
+        os.unlink(PesquisaNacionalDeSaude2019Dataset.new_filepath())
+        os.unlink(PesquisaNacionalDeSaude2019Dataset.new_datapackage_filepath())
+
     def test_dataset_attributes(self):
         description = (
             "Pesquisa Nacional de Saúde 2019, realizada pelo IBGE. "
@@ -244,6 +384,212 @@ class TestSinPatinhas:
         assert SinPatinhasDataset.filepath == filepath
 
 
+class TestWrite:
+    @pytest.fixture(autouse=True)
+    def data_dir(self, tmp_path, monkeypatch):
+        for dataset in [
+            SinPatinhasDataset,
+            PescadoresEPescadorasProfissionaisDataset,
+            PesquisaNacionalDeSaude2019Dataset,
+        ]:
+            monkeypatch.setattr(dataset, "dir", classmethod(lambda cls: tmp_path))
+        return tmp_path
+
+    @freeze_time("2000-01-01")
+    def test_prepare_partitioned_by_uf(self, data_dir):
+        result = SinPatinhasDataset.prepare(
+            "tests/fixtures/sample_sinpatinhas.csv", partitioned=True
+        )
+
+        output_dir = Path(SinPatinhasDataset.new_filepath(partitioned=True))
+        assert output_dir == data_dir / "sinpatinhas-01012000"
+        assert sorted(result["uf"].unique()) == sorted(
+            path.name.removeprefix("uf=") for path in output_dir.iterdir()
+        )
+        assert result.shape == (10, 7)
+        assert result.schema["datacadastro"] == pl.Date
+        datapackage = json.loads(
+            Path(SinPatinhasDataset.new_datapackage_filepath()).read_text()
+        )
+        assert [field["name"] for field in datapackage["schema"]["fields"]] == list(
+            result.columns
+        )
+
+    @freeze_time("2000-01-01")
+    def test_prepare_merged_csvs_partitioned_by_uf(self):
+        result = PescadoresEPescadorasProfissionaisDataset.prepare(
+            "tests/fixtures/pescadores", partitioned=True
+        )
+
+        output_dir = Path(
+            PescadoresEPescadorasProfissionaisDataset.new_filepath(partitioned=True)
+        )
+        assert result.shape == (198, 8)
+        assert {path.name for path in output_dir.iterdir()} == {
+            f"UF={uf}" for uf in result["UF"].unique()
+        }
+
+    @freeze_time("2000-01-01")
+    def test_prepare_in_parallel(self):
+        serial = PescadoresEPescadorasProfissionaisDataset.prepare(
+            "tests/fixtures/pescadores"
+        )
+
+        parallel = PescadoresEPescadorasProfissionaisDataset.prepare(
+            "tests/fixtures/pescadores", parallel=True, max_workers=2
+        )
+
+        assert parallel.equals(serial)
+
+    @freeze_time("2000-01-01")
+    def test_prepare_with_build_dir(self, tmp_path):
+        serial = PescadoresEPescadorasProfissionaisDataset.prepare(
+            "tests/fixtures/pescadores"
+        )
+        build_dir = tmp_path / "build"
+
+        for _ in range(2):  # the second time, with the converted CSVs
+            incremental = PescadoresEPescadorasProfissionaisDataset.prepare(
+                "tests/fixtures/pescadores", build_dir=str(build_dir)
+            )
+
+            assert incremental.equals(serial)
+        assert sorted(path.name for path in build_dir.iterdir()) == [
+            "build.json",
+            "pescadores_ba.parquet",
+            "pescadores_se.parquet",
+        ]
+
+    @freeze_time("2000-01-01")
+    def test_prepare_sorts_one_state_at_a_time(self, sort_keys):
+        dataset = PescadoresEPescadorasProfissionaisDataset
+
+        result = dataset.prepare("tests/fixtures/pescadores")
+
+        assert sort_keys == [None]  # not sorted as a whole
+        assert result.equals(result.sort(list(dataset.cluster_by)))
+
+    @freeze_time("2000-01-01")
+    def test_prepare_sorts_states_in_several_files(self, tmp_path, sort_keys):
+        dataset = PescadoresEPescadorasProfissionaisDataset
+        for name in ("pescadores_ba.csv", "pescadores_se.csv"):
+            content = Path("tests/fixtures/pescadores", name).read_bytes()
+            (tmp_path / name).write_bytes(content)
+            (tmp_path / f"mais_{name}").write_bytes(content)
+
+        result = dataset.prepare(str(tmp_path))
+
+        assert sort_keys == [dataset.cluster_by]
+        assert result.height == 396
+        assert result.equals(result.sort(list(dataset.cluster_by)))
+
+    @freeze_time("2000-01-01")
+    def test_prepare_sorts_by_cluster_keys(self, monkeypatch):
+        monkeypatch.setattr(SinPatinhasDataset, "row_group_size", 3)
+
+        SinPatinhasDataset.prepare("tests/fixtures/sample_sinpatinhas.csv")
+
+        filepath = SinPatinhasDataset.new_filepath()
+        df = pl.read_parquet(filepath)
+        assert df.equals(df.sort(list(SinPatinhasDataset.cluster_by)))
+        assert parquet_footer_stats(filepath)["row_groups"] == 4  # 10 rows
+
+    @freeze_time("2000-01-01")
+    def test_prepare_encodes_low_cardinality_columns(self):
+        result = SinPatinhasDataset.prepare("tests/fixtures/sample_sinpatinhas.csv")
+
+        df = pl.read_parquet(SinPatinhasDataset.new_filepath())
+        assert df.schema["especie"] == pl.Categorical
+        assert df.schema["no_municipio"] == pl.String  # too many distinct values
+        assert result.schema == df.schema
+        datapackage = json.loads(
+            Path(SinPatinhasDataset.new_datapackage_filepath()).read_text()
+        )
+        fields = {field["name"]: field for field in datapackage["schema"]["fields"]}
+        assert fields["especie"] == {
+            "name": "especie",
+            "type": "string",
+            "constraints": {"enum": ["Cão", "Gato"]},
+        }
+        assert "constraints" not in fields["no_municipio"]
+
+    @freeze_time("2000-01-01")
+    def test_prepare_without_categories(self, monkeypatch):
+        monkeypatch.setattr(SinPatinhasDataset, "max_categories", 0)
+
+        SinPatinhasDataset.prepare("tests/fixtures/sample_sinpatinhas.csv")
+
+        df = pl.read_parquet(SinPatinhasDataset.new_filepath())
+        assert df.schema["especie"] == pl.String
+
+    @freeze_time("2000-01-01")
+    def test_prepare_with_dataset_compression(self, monkeypatch):
+        monkeypatch.setattr(SinPatinhasDataset, "compression", "uncompressed")
+
+        SinPatinhasDataset.prepare("tests/fixtures/sample_sinpatinhas.csv")
+
+        stats = parquet_footer_stats(SinPatinhasDataset.new_filepath())
+        assert stats["compressed_size"] == stats["uncompressed_size"]
+
+    @freeze_time("2000-01-01")
+    def test_prepare_downcasts_numeric_columns(self):
+        result = SinPatinhasDataset.prepare("tests/fixtures/sample_sinpatinhas.csv")
+
+        df = pl.read_parquet(SinPatinhasDataset.new_filepath())
+        assert df.schema["idade"] == pl.Int8
+        assert result.schema == df.schema
+        datapackage = json.loads(
+            Path(SinPatinhasDataset.new_datapackage_filepath()).read_text()
+        )
+        fields = {field["name"]: field for field in datapackage["schema"]["fields"]}
+        assert fields["idade"] == {"name": "idade", "type": "integer", "dtype": "Int8"}
+
+    @freeze_time("2000-01-01")
+    def test_write_with_max_digits(self, monkeypatch):
+        monkeypatch.setattr(SinPatinhasDataset, "cluster_by", ())
+        df = pl.DataFrame({"codigo": [1, 2, 3], "quantidade": [1, 2, 3]})
+
+        filepath = SinPatinhasDataset.write(df, max_digits={"codigo": 4})
+
+        schema = pl.read_parquet_schema(filepath)
+        assert schema["codigo"] == pl.Int16
+        assert schema["quantidade"] == pl.Int8
+
+    @freeze_time("2000-01-01")
+    def test_prepare_without_downcast(self, monkeypatch):
+        monkeypatch.setattr(SinPatinhasDataset, "downcast", False)
+
+        SinPatinhasDataset.prepare("tests/fixtures/sample_sinpatinhas.csv")
+
+        df = pl.read_parquet(SinPatinhasDataset.new_filepath())
+        assert df.schema["idade"] == pl.Int64
+
+    @freeze_time("2000-01-01")
+    def test_create_pns_parquet_file_from_zip(self, tmp_path):
+        zip_filepath = tmp_path / "pns2019.zip"
+        with zipfile.ZipFile(zip_filepath, "w") as zip_file:
+            zip_file.writestr("pns2019.csv", "V0001,C008\n29,35\n28,7\n29,102\n")
+        data_dict = {
+            "V0001": {"alternative_name": "V0001__unidade_da_federacao", "length": 2},
+            "C008": {"alternative_name": "C008__idade_do_morador", "length": 3},
+        }
+
+        filepath = PesquisaNacionalDeSaude2019Dataset._create_parquet_file(
+            str(zip_filepath), data_dict
+        )
+
+        assert filepath == PesquisaNacionalDeSaude2019Dataset.new_filepath()
+        df = pl.read_parquet(filepath)
+        assert df.schema == pl.Schema(
+            {"V0001__unidade_da_federacao": pl.Int8, "C008__idade_do_morador": pl.Int16}
+        )
+        assert df.rows() == [(28, 7), (29, 35), (29, 102)]  # sorted by state
+
+    def test_dataset_without_partition_columns(self):
+        with pytest.raises(ValueError, match="não define colunas de partição"):
+            AldeiasIndigenasDataset.write(pl.DataFrame({"a": [1]}), partitioned=True)
+
+
 class TestCreateDatapackageFromFile:
     @pytest.fixture
     def sample_parquet_file(self, tmp_path):
@@ -287,6 +633,18 @@ class TestCreateDatapackageFromFile:
         assert "fields" in datapackage["schema"]
         datapackage_path_obj.unlink()
 
+    @freeze_time("2000-01-01")
+    def test_create_datapackage_records_checksum(self, sample_parquet_file):
+        datapackage_path = SinPatinhasDataset.create_datapackage_from_file(
+            sample_parquet_file
+        )
+        datapackage = json.loads(Path(datapackage_path).read_text())
+        Path(datapackage_path).unlink()
+
+        content = Path(sample_parquet_file).read_bytes()
+        assert datapackage["bytes"] == len(content)
+        assert datapackage["hash"] == f"sha256:{hashlib.sha256(content).hexdigest()}"
+
     @freeze_time("2000-01-01")
     def test_create_datapackage_type_mapping(self, sample_parquet_file):
         datapackage_path = SinPatinhasDataset.create_datapackage_from_file(
@@ -1,11 +1,333 @@
+import hashlib
+import json
+import os
+import zipfile
+from pathlib import Path
+
 import polars as pl
 import pytest
+import requests
+
+from cacimbao import helpers
+from cacimbao.helpers import (
+    configure_session,
+    convert_csvs,
+    data_files,
+    data_size,
+    download_and_extract_zip,
+    download_file,
+    encode_categories,
+    file_hash,
+    get_session,
+    is_sorted,
+    normalize_column_name,
+    order_fragments,
+    parse_hash,
+    scan_fragments,
+    sniff_separator,
+    tighten_types,
+    update_fragments,
+    verify_checksum,
+    write_parquet,
+)
+from cacimbao.parquet import parquet_footer_stats
+
+
+@pytest.fixture
+def zipped_dataset(http_server):
+    served_dir, base_url = http_server.dir, http_server.url
+    with zipfile.ZipFile(served_dir / "dataset.zip", "w") as zf:
+        zf.writestr("datapackage.json", '{"path": "dataset.csv"}')
+        zf.writestr("dataset.csv", "col1,col2\n1,2\n3,4")
+    return f"{base_url}/dataset.zip"
+
+
+class TestDownloadFile:
+    def test_download_file(self, http_server, tmp_path):
+        served_dir, base_url = http_server.dir, http_server.url
+        content = b"cacimbao" * 1000
+        (served_dir / "file.bin").write_bytes(content)
+
+        filepath = tmp_path / "file.bin"
+
+        validators = download_file(f"{base_url}/file.bin", filepath, 7)
+
+        assert filepath.read_bytes() == content
+        assert validators["etag"]
+        assert validators["last_modified"]
+
+    @pytest.mark.parametrize("validator", ["etag", "last_modified"])
+    def test_conditional_download_of_unchanged_file(
+        self, http_server, tmp_path, validator
+    ):
+        (http_server.dir / "file.bin").write_bytes(b"cacimbao")
+        url = f"{http_server.url}/file.bin"
+        validators = download_file(url, tmp_path / "file.bin")
+        filepath = tmp_path / "again.bin"
+
+        result = download_file(url, filepath, **{validator: validators[validator]})
+
+        assert result is None
+        assert filepath.exists() is False
+        assert http_server.status_codes == [200, 304]
+
+    def test_raise_error_when_download_fails(self, http_server, tmp_path):
+        base_url = http_server.url
+
+        with pytest.raises(requests.HTTPError, match="Falha ao baixar o arquivo"):
+            download_file(f"{base_url}/missing.bin", tmp_path / "missing.bin")
+
+
+class TestSession:
+    @pytest.fixture(autouse=True)
+    def default_session(self):
+        yield
+        configure_session()
+
+    def test_session_is_shared(self):
+        assert get_session() is get_session()
+
+    def test_configure_session_replaces_the_session(self):
+        session = get_session()
+
+        configure_session(retries=1, timeout=(1, 2))
+
+        assert get_session() is not session
+        assert get_session().get_adapter("https://").max_retries.total == 1
+
+    def test_retry_on_server_errors(self, http_server, tmp_path):
+        configure_session(retries=2, backoff_factor=0)
+        (http_server.dir / "file.bin").write_bytes(b"cacimbao")
+        http_server.failures["/file.bin"] = 2
+        filepath = tmp_path / "file.bin"
+
+        download_file(f"{http_server.url}/file.bin", filepath)
+
+        assert filepath.read_bytes() == b"cacimbao"
+        assert http_server.status_codes == [503, 503, 200]
+
+    def test_give_up_after_retries(self, http_server, tmp_path):
+        configure_session(retries=1, backoff_factor=0)
+        (http_server.dir / "file.bin").write_bytes(b"cacimbao")
+        http_server.failures["/file.bin"] = 2
+
+        with pytest.raises(requests.HTTPError, match="503"):
+            download_file(f"{http_server.url}/file.bin", tmp_path / "file.bin")
+
+        assert http_server.status_codes == [503, 503]
+
+
+class TestResumeDownload:
+    @pytest.fixture
+    def served_file(self, http_server, tmp_path):
+        content = bytes(range(256)) * 100
+        (http_server.dir / "file.bin").write_bytes(content)
+        url = f"{http_server.url}/file.bin"
+        validators = download_file(url, tmp_path / "reference.bin")
+        http_server.requests.clear()
+        http_server.status_codes.clear()
+        return url, content, validators
+
+    def _write_partial(self, filepath, url, content, etag):
+        filepath.with_name("file.bin.part").write_bytes(content)
+        filepath.with_name("file.bin.part.json").write_text(
+            json.dumps({"url": url, "etag": etag, "last_modified": None})
+        )
+
+    def test_resume_partial_download(self, http_server, served_file, tmp_path):
+        url, content, validators = served_file
+        filepath = tmp_path / "file.bin"
+        self._write_partial(filepath, url, content[:1000], validators["etag"])
+
+        download_file(url, filepath)
+
+        assert filepath.read_bytes() == content
+        assert http_server.status_codes == [206]
+        assert http_server.requests[0]["Range"] == "bytes=1000-"
+        assert http_server.requests[0]["If-Range"] == validators["etag"]
+        assert filepath.with_name("file.bin.part").exists() is False
+        assert filepath.with_name("file.bin.part.json").exists() is False
+
+    def test_do_not_splice_partial_of_a_changed_file(
+        self, http_server, served_file, tmp_path
+    ):
+        url, content, _ = served_file
+        filepath = tmp_path / "file.bin"
+        self._write_partial(filepath, url, b"old version", '"old-etag"')
+
+        download_file(url, filepath)
+
+        assert filepath.read_bytes() == content
+        assert http_server.status_codes == [200]
+
+    def test_start_over_when_server_sends_another_range(
+        self, http_server, served_file, tmp_path, monkeypatch
+    ):
+        url, content, validators = served_file
+        filepath = tmp_path / "file.bin"
+        self._write_partial(filepath, url, content[:1000], validators["etag"])
+        handler = http_server.RequestHandlerClass.func
+        send_partial_content = handler._send_partial_content
+        monkeypatch.setattr(
+            handler,
+            "_send_partial_content",
+            lambda self, path, start: send_partial_content(self, path, start - 10),
+        )
+
+        download_file(url, filepath)
+
+        assert filepath.read_bytes() == content
+        assert http_server.status_codes == [206, 200]
+        assert "Range" not in http_server.requests[1]
+
+    def test_finish_complete_partial_download(self, http_server, served_file, tmp_path):
+        url, content, validators = served_file
+        filepath = tmp_path / "file.bin"
+        self._write_partial(filepath, url, content, validators["etag"])
+
+        assert download_file(url, filepath) == {
+            "etag": validators["etag"],
+            "last_modified": None,
+        }
+        assert filepath.read_bytes() == content
+        assert http_server.status_codes == [416]
+        assert filepath.with_name("file.bin.part").exists() is False
+        assert filepath.with_name("file.bin.part.json").exists() is False
+
+    def test_start_over_when_partial_is_too_long(
+        self, http_server, served_file, tmp_path
+    ):
+        url, content, validators = served_file
+        filepath = tmp_path / "file.bin"
+        self._write_partial(filepath, url, content + b"x", validators["etag"])
+
+        download_file(url, filepath)
+
+        assert filepath.read_bytes() == content
+        assert http_server.status_codes == [416, 200]
 
-from cacimbao.helpers import merge_csvs_to_parquet, normalize_column_name
+    def test_start_over_when_partial_is_not_from_the_same_url(
+        self, http_server, served_file, tmp_path
+    ):
+        url, content, validators = served_file
+        filepath = tmp_path / "file.bin"
+        self._write_partial(filepath, "http://other/", b"other", validators["etag"])
 
+        download_file(url, filepath)
 
-class TestMergeCSVsToParquet:
-    def test_merge_csvs_to_parquet(self, tmp_path):
+        assert filepath.read_bytes() == content
+        assert "Range" not in http_server.requests[0]
+
+    def test_keep_partial_file_when_download_is_interrupted(
+        self, http_server, served_file, tmp_path, monkeypatch
+    ):
+        url, content, _ = served_file
+        filepath = tmp_path / "file.bin"
+        iter_content = requests.Response.iter_content
+
+        def interrupted_iter_content(response, chunk_size=1, decode_unicode=False):
+            yield next(iter_content(response, chunk_size))
+            raise requests.ConnectionError("Connection reset by peer")
+
+        with monkeypatch.context() as m:
+            m.setattr(requests.Response, "iter_content", interrupted_iter_content)
+            with pytest.raises(requests.ConnectionError):
+                download_file(url, filepath, chunk_size=4096)
+
+        assert filepath.exists() is False
+        assert filepath.with_name("file.bin.part").stat().st_size == 4096
+
+        download_file(url, filepath)
+
+        assert filepath.read_bytes() == content
+        assert http_server.status_codes == [200, 206]
+
+
+class TestDownloadAndExtractZip:
+    def test_download_and_extract_zip(self, zipped_dataset, tmp_path):
+        target_dir = tmp_path / "dataset"
+
+        result = download_and_extract_zip(zipped_dataset, target_dir)
+
+        assert result == target_dir
+        assert sorted(path.name for path in target_dir.iterdir()) == [
+            "datapackage.json",
+            "dataset.csv",
+        ]  # the downloaded zip file is removed after the extraction
+        assert pl.read_csv(target_dir / "dataset.csv").shape == (2, 2)
+
+    def test_raise_error_when_file_is_not_a_zip(self, http_server, tmp_path):
+        served_dir, base_url = http_server.dir, http_server.url
+        (served_dir / "dataset.zip").write_text("not a zip")
+        target_dir = tmp_path / "dataset"
+
+        with pytest.raises(zipfile.BadZipFile, match="não é um ZIP válido"):
+            download_and_extract_zip(f"{base_url}/dataset.zip", target_dir)
+
+        assert list(target_dir.iterdir()) == []
+
+
+class TestChecksum:
+    @pytest.fixture
+    def data_file(self, tmp_path):
+        filepath = tmp_path / "dados.parquet"
+        filepath.write_bytes(bytes(range(256)) * 1000)
+        return filepath
+
+    @pytest.mark.parametrize("use_mmap", [False, True])
+    @pytest.mark.parametrize("chunk_size", [1000, 4096, 1024 * 1024])
+    def test_file_hash(self, data_file, chunk_size, use_mmap):
+        expected = hashlib.sha256(data_file.read_bytes()).hexdigest()
+
+        assert (
+            file_hash(data_file, chunk_size=chunk_size, use_mmap=use_mmap) == expected
+        )
+
+    @pytest.mark.parametrize("use_mmap", [False, True])
+    def test_file_hash_of_empty_file(self, tmp_path, use_mmap):
+        filepath = tmp_path / "vazio"
+        filepath.touch()
+
+        assert (
+            file_hash(filepath, "md5", use_mmap=use_mmap) == hashlib.md5().hexdigest()
+        )
+
+    def test_hash_of_partitioned_directory(self, tmp_path):
+        for uf, content in [("SE", b"sergipe"), ("BA", b"bahia")]:
+            (tmp_path / f"uf={uf}").mkdir()
+            (tmp_path / f"uf={uf}" / "00000000.parquet").write_bytes(content)
+        (tmp_path / "notas.txt").write_text("ignorado")
+
+        assert data_size(tmp_path) == len(b"bahiasergipe")
+        expected = hashlib.sha256(b"bahiasergipe").hexdigest()  # in path order
+        assert file_hash(tmp_path) == expected
+        assert verify_checksum(tmp_path, f"sha256:{expected}", 12) is True
+
+    def test_parse_hash(self):
+        assert parse_hash("sha256:AB12") == ("sha256", "ab12")
+        assert parse_hash("ab12") == ("md5", "ab12")  # frictionless default
+
+    def test_verify_checksum(self, data_file):
+        content = data_file.read_bytes()
+        sha256 = f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+        assert verify_checksum(data_file, sha256, len(content)) is True
+        assert verify_checksum(data_file, hashlib.md5(content).hexdigest()) is True
+        assert verify_checksum(data_file, sha256, len(content) + 1) is False
+
+        data_file.write_bytes(content[:-1] + b"x")
+
+        assert verify_checksum(data_file, sha256, len(content)) is False
+        assert verify_checksum(data_file, sha256, use_mmap=True) is False
+
+
+class TestMergeCSVs:
+    def merge(self, data_dir, tmp_path, **kwargs):
+        csv_files = sorted(Path(data_dir).glob("*.csv"))
+        fragments = convert_csvs(csv_files, tmp_path, max_workers=1, **kwargs)
+        return scan_fragments(fragments).collect()
+
+    def test_merge_csvs(self, tmp_path):
         data_dir = tmp_path / "data"
         data_dir.mkdir()
         csv1 = data_dir / "file1.csv"
@@ -13,18 +335,13 @@ class TestMergeCSVsToParquet:
         csv2 = data_dir / "file2.csv"
         csv2.write_text("col1,col2\n5,6\n7,8")
 
-        output_file = tmp_path / "merged.parquet"
-        assert output_file.exists() is False
-
-        merge_csvs_to_parquet(data_dir, str(output_file))
+        df = self.merge(data_dir, tmp_path)
 
-        assert output_file.exists() is True
-
-        df = pl.read_parquet(output_file)
         assert df.shape == (4, 2)  # 4 rows and 2 columns
+        assert (tmp_path / "file1.parquet").exists() is True
 
-    def test_accept_arguments_to_read_csv(self, tmp_path):
-        """Test that we can pass additional arguments to read_csv.
+    def test_accept_arguments_to_scan_csv(self, tmp_path):
+        """Test that we can pass additional arguments to scan_csv.
 
         In this case, the `truncate_ragged_lines` argument is used to ignore
         the extra columns in the second CSV file.
@@ -36,15 +353,382 @@ class TestMergeCSVsToParquet:
         csv2 = data_dir / "file2.csv"
         csv2.write_text("col1,col2\n5,6\n7,8,9,10")
 
-        output_file = tmp_path / "merged.parquet"
-        assert output_file.exists() is False
+        df = self.merge(data_dir, tmp_path, truncate_ragged_lines=True)
 
-        merge_csvs_to_parquet(data_dir, str(output_file), truncate_ragged_lines=True)
+        assert df.shape == (4, 2)  # 4 rows and 2 columns
 
-        assert output_file.exists() is True
+    def test_drop_columns(self, tmp_path):
+        df = self.merge(
+            "tests/fixtures/pescadores",
+            tmp_path,
+            drop_columns=["CPF", "Nome do Pescador"],
+            truncate_ragged_lines=True,
+        )
 
-        df = pl.read_parquet(output_file)
-        assert df.shape == (4, 2)  # 4 rows and 2 columns
+        assert "CPF" not in df.columns
+        assert "Nome do Pescador" not in df.columns
+        assert df["UF"].unique().sort().to_list() == ["BA", "SE"]
+
+
+class TestConvertCSVs:
+    @pytest.fixture
+    def data_dir(self, tmp_path):
+        data_dir = tmp_path / "data"
+        data_dir.mkdir()
+        (data_dir / "ba.csv").write_text(
+            "\ufeffnome;uf;codigo\nPedro;BA;1\nHelena;BA;2"
+        )
+        (data_dir / "se.csv").write_text("nome,uf,codigo,extra\nTonino,SE,A3,x,y")
+        return data_dir
+
+    @pytest.mark.parametrize(
+        "header,expected",
+        [("a;b;c", ";"), ("a,b,c", ","), ("a\tb", "\t"), ("a|b", "|"), ("a", ";")],
+    )
+    def test_sniff_separator(self, tmp_path, header, expected):
+        csv_file = tmp_path / "dados.csv"
+        csv_file.write_text(f"{header}\n")
+
+        assert sniff_separator(csv_file) == expected
+
+    def test_convert_and_reconcile_schemas(self, tmp_path, data_dir):
+        csv_files = sorted(data_dir.glob("*.csv"))
+
+        fragments = convert_csvs(
+            csv_files,
+            tmp_path,
+            drop_columns=["nome"],
+            max_workers=2,
+            truncate_ragged_lines=True,
+        )
+
+        assert fragments == [tmp_path / "ba.parquet", tmp_path / "se.parquet"]
+        df = scan_fragments(fragments).collect()
+        assert df.schema == pl.Schema(
+            {"uf": pl.String, "codigo": pl.String, "extra": pl.String}
+        )
+        assert df.rows() == [("BA", "1", None), ("BA", "2", None), ("SE", "A3", "x")]
+
+    def test_invalid_file(self, tmp_path, data_dir):
+        with pytest.raises(ValueError, match="Erro ao converter o arquivo .*se.csv"):
+            convert_csvs([data_dir / "se.csv"], tmp_path)  # ragged line
+
+    def test_sort_each_fragment(self, tmp_path, data_dir):
+        fragments = convert_csvs(
+            sorted(data_dir.glob("*.csv")),
+            tmp_path,
+            max_workers=2,
+            sort_by=["nome"],
+            truncate_ragged_lines=True,
+        )
+
+        assert pl.read_parquet(fragments[0])["nome"].to_list() == ["Helena", "Pedro"]
+
+
+class TestOrderFragments:
+    def fragments(self, tmp_path, *values):
+        fragments = []
+        for i, value in enumerate(values):
+            fragment = tmp_path / f"{i}.parquet"
+            pl.DataFrame({"uf": value, "col": range(len(value))}).write_parquet(
+                fragment
+            )
+            fragments.append(fragment)
+        return fragments
+
+    def test_order_by_first_column(self, tmp_path):
+        se, ba, empty = self.fragments(tmp_path, ["SE"], ["BA", "BA"], [])
+
+        assert order_fragments([se, ba, empty], ["uf", "col"]) == [empty, ba, se]
+
+    @pytest.mark.parametrize(
+        "values", [(["BA", "SE"], ["PE"]), (["BA"], ["BA"]), (["BA"], [None])]
+    )
+    def test_overlapping_fragments(self, tmp_path, values):
+        fragments = self.fragments(tmp_path, *values)
+
+        assert order_fragments(fragments, ["uf"]) is None
+
+
+class TestUpdateFragments:
+    @pytest.fixture
+    def data_dir(self, tmp_path):
+        data_dir = tmp_path / "data"
+        data_dir.mkdir()
+        (data_dir / "ba.csv").write_text("uf,col\nBA,1\nBA,2")
+        (data_dir / "se.csv").write_text("uf,col\nSE,3")
+        return data_dir
+
+    @pytest.fixture
+    def converted(self, monkeypatch):
+        converted = []
+        convert_csvs = helpers.convert_csvs
+
+        def spy(csv_files, *args, **kwargs):
+            converted.append(sorted(file.name for file in csv_files))
+            return convert_csvs(csv_files, *args, **kwargs)
+
+        monkeypatch.setattr(helpers, "convert_csvs", spy)
+        return converted
+
+    def build(self, data_dir, build_dir, **kwargs):
+        fragments = update_fragments(
+            sorted(data_dir.glob("*.csv")), build_dir, max_workers=1, **kwargs
+        )
+        return scan_fragments(fragments).collect()
+
+    def test_convert_only_new_or_changed_files(self, tmp_path, data_dir, converted):
+        build_dir = tmp_path / "build"
+
+        self.build(data_dir, build_dir)
+        df = self.build(data_dir, build_dir)
+
+        assert converted == [["ba.csv", "se.csv"], []]
+        assert df["col"].to_list() == [1, 2, 3]
+
+        (data_dir / "se.csv").write_text("uf,col\nSE,3\nSE,4")
+        (data_dir / "pe.csv").write_text("uf,col\nPE,5")
+        df = self.build(data_dir, build_dir)
+
+        assert converted[-1] == ["pe.csv", "se.csv"]
+        assert df["col"].to_list() == [1, 2, 5, 3, 4]
+        manifest = json.loads((build_dir / "build.json").read_text())
+        assert manifest["files"]["pe.csv"]["fragment"] == "pe.parquet"
+        assert manifest["files"]["pe.csv"]["sha256"] == file_hash(data_dir / "pe.csv")
+
+    def test_same_content_with_new_modification_time(
+        self, tmp_path, data_dir, converted
+    ):
+        build_dir = tmp_path / "build"
+        self.build(data_dir, build_dir)
+
+        os.utime(data_dir / "ba.csv", ns=(0, 0))
+        self.build(data_dir, build_dir)
+
+        assert converted[-1] == []
+        manifest = json.loads((build_dir / "build.json").read_text())
+        assert manifest["files"]["ba.csv"]["mtime_ns"] == 0
+
+    def test_remove_fragments_of_removed_files(self, tmp_path, data_dir, converted):
+        build_dir = tmp_path / "build"
+        self.build(data_dir, build_dir)
+
+        (data_dir / "se.csv").unlink()
+        df = self.build(data_dir, build_dir)
+
+        assert converted[-1] == []
+        assert df["uf"].to_list() == ["BA", "BA"]
+        assert not (build_dir / "se.parquet").exists()
+
+    def test_convert_all_files_with_other_arguments(
+        self, tmp_path, data_dir, converted
+    ):
+        build_dir = tmp_path / "build"
+        self.build(data_dir, build_dir)
+
+        df = self.build(data_dir, build_dir, drop_columns=["uf"])
+
+        assert converted[-1] == ["ba.csv", "se.csv"]
+        assert df.columns == ["col"]
+
+
+class TestEncodeCategories:
+    def test_encode_low_cardinality_columns(self):
+        df = pl.DataFrame(
+            {
+                "uf": ["SE", "BA", None, "BA"] * 25,
+                "nome": [f"nome {i}" for i in range(100)],
+                "idade": list(range(100)),
+            }
+        )
+
+        encoded = encode_categories(df).collect()
+
+        assert encoded.schema["uf"] == pl.Categorical
+        assert encoded.schema["nome"] == pl.String  # all values are distinct
+        assert encoded.schema["idade"] == pl.Int64
+        assert encoded.select(pl.col("uf").cast(pl.String)).equals(df.select("uf"))
+
+    def test_limits(self):
+        df = pl.DataFrame({"codigo": [str(i % 10) for i in range(100)]})
+
+        assert encode_categories(df, max_categories=9).collect_schema() == df.schema
+        assert encode_categories(df, max_ratio=0.05).collect_schema() == df.schema
+        assert encode_categories(df).collect_schema()["codigo"] == pl.Categorical
+
+    def test_encoded_columns_accept_any_string(self):
+        df = encode_categories(pl.DataFrame({"uf": ["SE", "BA"] * 5})).collect()
+        other = encode_categories(pl.DataFrame({"uf": ["PE"] * 10})).collect()
+
+        assert df.filter(pl.col("uf") == "PE").height == 0
+        assert df.filter(pl.col("uf").is_in(["BA", "PE"])).height == 5
+        assert pl.concat([df, other])["uf"].value_counts().height == 3
+        assert df.sort("uf")["uf"].to_list() == ["BA"] * 5 + ["SE"] * 5
+
+    def test_without_string_columns(self):
+        df = pl.DataFrame({"idade": [1, 1, 1]})
+
+        assert encode_categories(df).collect().equals(df)
+
+
+class TestIsSorted:
+    @pytest.mark.parametrize(
+        "data,expected",
+        [
+            ({"uf": ["BA", "BA", "SE"], "idade": [2, 3, 1]}, True),
+            ({"uf": ["BA", "BA", "SE"], "idade": [3, 2, 1]}, False),
+            ({"uf": ["SE", "BA", "BA"], "idade": [1, 2, 3]}, False),
+            ({"uf": [None, "BA", "BA"], "idade": [1, 2, 3]}, False),
+            ({"uf": [], "idade": []}, True),
+        ],
+    )
+    def test_is_sorted(self, data, expected):
+        df = pl.DataFrame(data, schema={"uf": pl.String, "idade": pl.Int64})
+
+        assert is_sorted(df.lazy(), ["uf", "idade"]) is expected
+
+
+class TestTightenTypes:
+    def test_downcast_integers_to_smallest_type(self):
+        df = pl.DataFrame(
+            {
+                "idade": [1, 30, None],
+                "saldo": [-200, 0, 1000],
+                "populacao": [0, 100_000, 1],
+                "grande": [0, 1, 10**10],
+                "vazia": pl.Series([None, None, None], dtype=pl.Int64),
+            }
+        )
+
+        tightened = tighten_types(df).collect()
+
+        assert tightened.schema == pl.Schema(
+            {
+                "idade": pl.Int8,
+                "saldo": pl.Int16,
+                "populacao": pl.Int32,
+                "grande": pl.Int64,
+                "vazia": pl.Int64,
+            }
+        )
+        assert tightened.cast(df.schema).equals(df)
+
+    def test_downcast_to_unsigned_types(self):
+        df = pl.DataFrame(
+            {
+                "codigo": pl.Series([0, 200, 17], dtype=pl.UInt8),
+                "ano": pl.Series([0, 200, 17], dtype=pl.Int64),
+                "contagem": pl.Series([1, 60_000, 3], dtype=pl.UInt64),
+                "cep": pl.Series([1, 2, 3], dtype=pl.UInt32),
+            }
+        )
+
+        tightened = tighten_types(df).collect()
+
+        assert tightened.schema == pl.Schema(
+            {
+                "codigo": pl.UInt8,  # not widened to Int16
+                "ano": pl.UInt8,
+                "contagem": pl.UInt16,
+                "cep": pl.UInt8,
+            }
+        )
+        assert tightened.cast(df.schema).equals(df)
+
+    def test_unsigned_values_above_the_maximum_of_int64(self):
+        df = pl.DataFrame({"hash": pl.Series([1, 2**63 + 1], dtype=pl.UInt64)})
+
+        tightened = tighten_types(df).collect()
+
+        assert tightened.equals(df)
+
+    def test_downcast_floats_without_precision_loss(self):
+        df = pl.DataFrame(
+            {
+                "peso": [0.5, 1.25, None, float("nan")],
+                "renda": [0.1, 0.2, 0.3, 0.4],  # not representable as Float32
+            }
+        )
+
+        tightened = tighten_types(df).collect()
+
+        assert tightened.schema["peso"] == pl.Float32
+        assert tightened.schema["renda"] == pl.Float64
+
+    def test_max_digits(self):
+        df = pl.DataFrame({"codigo": [1, 2, 3], "estado": [1, 2, 3]})
+
+        tightened = tighten_types(df, max_digits={"codigo": 3, "estado": 1})
+
+        assert tightened.collect_schema()["codigo"] == pl.Int16  # up to 999
+        assert tightened.collect_schema()["estado"] == pl.Int8
+
+    def test_max_digits_smaller_than_values(self):
+        df = pl.DataFrame({"codigo": [1, 2, 300]})
+
+        tightened = tighten_types(df, max_digits={"codigo": 1}).collect()
+
+        assert tightened.schema["codigo"] == pl.Int16
+        assert tightened.cast(df.schema).equals(df)
+
+    def test_without_numeric_columns(self):
+        df = pl.DataFrame({"uf": ["BA", "SE"]})
+
+        assert tighten_types(df).collect().equals(df)
+
+
+class TestWriteParquet:
+    @pytest.fixture
+    def df(self):
+        return pl.DataFrame(
+            {"uf": ["SE", "BA", "PE", "BA"] * 25, "valor": list(range(100))}
+        )
+
+    def test_sort_and_row_groups(self, tmp_path, df):
+        output_file = tmp_path / "dados.parquet"
+
+        write_parquet(df.lazy(), str(output_file), sort_by=["uf"], row_group_size=30)
+
+        written = pl.read_parquet(output_file)
+        assert written["uf"].to_list() == sorted(df["uf"].to_list())
+        assert written.sort("valor").equals(df)
+        assert parquet_footer_stats(output_file)["row_groups"] == 4
+
+    def test_partitioned(self, tmp_path, df):
+        output_dir = tmp_path / "dados"
+        output_dir.mkdir()
+        (output_dir / "antigo.parquet").write_bytes(b"")  # previous version
+
+        write_parquet(df, str(output_dir), partition_by=["uf"], sort_by=["valor"])
+
+        files = data_files(output_dir)
+        assert [file.parent.name for file in files] == ["uf=BA", "uf=PE", "uf=SE"]
+        bahia = pl.read_parquet(files[0])
+        assert bahia.columns == ["uf", "valor"]
+        assert bahia["valor"].is_sorted()
+        assert bahia.height == 50
+
+    def test_compression(self, tmp_path, df):
+        sizes = {}
+        for compression, level in [("uncompressed", None), ("zstd", 1), ("zstd", 19)]:
+            output_file = tmp_path / f"dados-{compression}-{level}.parquet"
+            write_parquet(
+                df, str(output_file), compression=compression, compression_level=level
+            )
+            assert pl.read_parquet(output_file).equals(df)
+            sizes[compression, level] = parquet_footer_stats(output_file)
+
+        uncompressed = sizes["uncompressed", None]
+        assert uncompressed["compressed_size"] == uncompressed["uncompressed_size"]
+        assert (
+            sizes["zstd", 19]["compressed_size"]
+            <= sizes["zstd", 1]["compressed_size"]
+            < uncompressed["compressed_size"]
+        )
+
+    def test_unknown_compression(self, tmp_path, df):
+        with pytest.raises(ValueError, match="compression"):
+            write_parquet(df, str(tmp_path / "dados.parquet"), compression="rar")
 
 
 class TestNormalize:
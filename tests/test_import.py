@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ["narwhals", "pandas", "polars", "requests", "urllib3"]
+
+
+def run_python(code, home):
+    env = {**os.environ, "HOME": str(home), "USERPROFILE": str(home)}
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+class TestImport:
+    def test_import_does_not_load_heavy_dependencies(self, tmp_path):
+        code = (
+            "import sys\n"
+            "import cacimbao\n"
+            "from cacimbao.datasets import get_dataset\n"
+            "cacimbao.list_datasets(include_metadata=True)\n"
+            "get_dataset('sinpatinhas')\n"
+            f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+        )
+
+        assert run_python(code, tmp_path) == "[]"
+
+    def test_import_does_not_create_the_datasets_dir(self, tmp_path):
+        run_python("import cacimbao", tmp_path)
+
+        assert list(tmp_path.iterdir()) == []
@@ -1,7 +1,64 @@
+import asyncio
+import json
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import polars as pl
 import pytest
+import requests
+
+from cacimbao import (
+    adownload_dataset,
+    aload_dataset,
+    dataset_stats,
+    datasets_manifest,
+    download_dataset,
+    download_datasets,
+    iter_batches,
+    list_datasets,
+    load_dataset,
+    loaders,
+    scan_dataset,
+    verify_dataset,
+    verify_datasets,
+)
+from cacimbao.cache import (
+    cache_info,
+    disable_memory_cache,
+    enable_memory_cache,
+    get_cache_dir,
+    get_entry,
+    memory_cache_info,
+    set_cache_max_size,
+    update_entry,
+)
+from cacimbao.datasets import (
+    FilmografiaBrasileiraDataset,
+    SinPatinhasDataset,
+    get_dataset,
+)
+from cacimbao.helpers import file_sha256
+
 
-from cacimbao import download_dataset, list_datasets, load_dataset
+@pytest.fixture
+def remote_dataset(http_server, tmp_path, monkeypatch):
+    """Serve a fake version of a remote dataset and use a temporary cache dir."""
+    served_dir, base_url = http_server.dir, http_server.url
+    parquet_filepath = tmp_path / "filmografia.parquet"
+    pl.DataFrame({"titulo": ["Central do Brasil", "Bacurau"]}).write_parquet(
+        parquet_filepath
+    )
+    with zipfile.ZipFile(served_dir / "filmografia.zip", "w") as zf:
+        zf.writestr("datapackage.json", json.dumps({"path": "filmografia.parquet"}))
+        zf.write(parquet_filepath, "filmografia.parquet")
+
+    monkeypatch.setattr(
+        FilmografiaBrasileiraDataset, "download_url", f"{base_url}/filmografia.zip"
+    )
+    monkeypatch.setenv("CACIMBAO_CACHE_DIR", str(tmp_path / "cache"))
+    return http_server
 
 
 class TestDownloadDataset:
@@ -25,3 +82,681 @@ class TestDownloadDataset:
         df = load_dataset(dataset_name)
         assert isinstance(df, pl.DataFrame)
         assert df.shape[0] > 0, f"Dataset {dataset_name} is empty"
+
+
+class TestScanDataset:
+    def test_scan_local_dataset(self):
+        lf = scan_dataset("sinpatinhas")
+        assert isinstance(lf, pl.LazyFrame)
+
+    def test_scan_pushes_down_columns_and_filters(self):
+        df = (
+            scan_dataset("sinpatinhas")
+            .filter(pl.col("uf") == "BA")
+            .select(["uf", "especie"])
+            .collect()
+        )
+
+        assert df.columns == ["uf", "especie"]
+        assert df.shape[0] > 0
+        assert df["uf"].unique().to_list() == ["BA"]
+
+    def test_scan_matches_load(self):
+        expected = load_dataset("salario_minimo_real_vigente")
+        df = scan_dataset("salario_minimo_real_vigente").collect()
+        assert df.equals(expected)
+
+
+class TestColumnsAndFilters:
+    def test_load_selected_columns(self):
+        df = load_dataset("sinpatinhas", columns=["uf", "especie"])
+
+        assert df.columns == ["uf", "especie"]
+        assert df.shape[0] == load_dataset("sinpatinhas").shape[0]
+
+    def test_load_filtered_rows(self):
+        expected = load_dataset("sinpatinhas").filter(
+            pl.col("uf").is_in(["BA", "SE"]) & (pl.col("especie") == "Gato")
+        )
+
+        df = load_dataset(
+            "sinpatinhas", filters={"uf": ["BA", "SE"], "especie": "Gato"}
+        )
+
+        assert df.shape[0] > 0
+        assert df.equals(expected)
+
+    def test_load_filtered_rows_and_selected_columns(self):
+        df = download_dataset(
+            "sinpatinhas", columns=["no_municipio"], filters={"uf": "SE"}
+        )
+
+        assert df.columns == ["no_municipio"]
+        assert df.shape[0] == load_dataset("sinpatinhas", filters={"uf": "SE"}).height
+
+    def test_load_filtered_rows_as_pandas(self):
+        pytest.importorskip("pandas")
+        df = load_dataset(
+            "sinpatinhas", df_format="pandas", columns=["uf"], filters={"uf": "SE"}
+        )
+
+        assert list(df.columns) == ["uf"]
+        assert set(df["uf"]) == {"SE"}
+
+    def test_columns_and_filters_are_part_of_the_memory_cache_key(self):
+        enable_memory_cache()
+        try:
+            load_dataset("sinpatinhas", columns=["uf"])
+            load_dataset("sinpatinhas", columns=["uf"], filters={"uf": {"SE", "BA"}})
+            load_dataset("sinpatinhas", columns=["uf"], filters={"uf": ["BA", "SE"]})
+            df = load_dataset("sinpatinhas", columns=["uf"])
+
+            assert df.columns == ["uf"]
+            info = memory_cache_info()
+            assert (info["hits"], info["misses"], info["entries"]) == (2, 2, 2)
+        finally:
+            disable_memory_cache()
+
+
+class TestIterBatches:
+    def test_iterate_over_all_rows_in_bounded_batches(self):
+        expected = load_dataset("aldeias_indigenas")
+
+        batches = list(iter_batches("aldeias_indigenas", batch_size=1000))
+
+        assert [batch.height for batch in batches[:-1]] == [1000] * (len(batches) - 1)
+        assert 0 < batches[-1].height <= 1000
+        assert pl.concat(batches).equals(expected)
+
+    def test_iterate_over_selected_columns(self):
+        batches = iter_batches("sinpatinhas", batch_size=100_000, columns=["uf"])
+
+        first = next(batches)
+
+        assert first.columns == ["uf"]
+        assert first.height == 100_000
+
+    def test_iterate_over_remote_dataset(self, remote_dataset):
+        batches = list(iter_batches("filmografia_brasileira", batch_size=1))
+
+        assert [batch["titulo"][0] for batch in batches] == [
+            "Central do Brasil",
+            "Bacurau",
+        ]
+
+    def test_batch_size_must_be_positive(self):
+        with pytest.raises(ValueError):
+            next(iter_batches("sinpatinhas", batch_size=0))
+
+
+class TestDatasetCache:
+    def test_record_downloaded_dataset_in_manifest(self, remote_dataset):
+        df = download_dataset("filmografia_brasileira")
+
+        assert df.shape == (2, 1)
+        entry = get_entry(get_cache_dir(), "filmografia_brasileira")
+        file_path = get_cache_dir() / "filmografia_brasileira" / entry["path"]
+        assert entry["url"] == FilmografiaBrasileiraDataset.download_url
+        assert entry["size"] == file_path.stat().st_size
+        assert entry["sha256"] == file_sha256(file_path)
+
+    def test_use_cached_dataset_without_downloading_again(self, remote_dataset):
+        download_dataset("filmografia_brasileira")
+        (remote_dataset.dir / "filmografia.zip").unlink()  # any new download fails
+
+        df = download_dataset("filmografia_brasileira")
+
+        assert df.shape == (2, 1)
+
+    def test_download_again_when_url_changes(self, remote_dataset, monkeypatch):
+        download_dataset("filmografia_brasileira")
+        (remote_dataset.dir / "filmografia.zip").rename(remote_dataset.dir / "v2.zip")
+        new_url = FilmografiaBrasileiraDataset.download_url.replace(
+            "filmografia.zip", "v2.zip"
+        )
+        monkeypatch.setattr(FilmografiaBrasileiraDataset, "download_url", new_url)
+
+        download_dataset("filmografia_brasileira")
+
+        entry = get_entry(get_cache_dir(), "filmografia_brasileira")
+        assert entry["url"] == new_url
+
+    def test_refresh_downloads_again(self, remote_dataset):
+        download_dataset("filmografia_brasileira")
+        (remote_dataset.dir / "filmografia.zip").unlink()
+
+        with pytest.raises(requests.HTTPError):
+            download_dataset("filmografia_brasileira", refresh=True)
+
+        # the previous version is kept when the refresh fails
+        df = download_dataset("filmografia_brasileira", offline=True)
+        assert df.shape == (2, 1)
+
+    def test_offline_mode_requires_cached_dataset(self, remote_dataset):
+        with pytest.raises(FileNotFoundError, match="não encontrada no cache"):
+            download_dataset("filmografia_brasileira", offline=True)
+
+    def test_record_last_access(self, remote_dataset):
+        download_dataset("filmografia_brasileira")
+
+        entry = get_entry(get_cache_dir(), "filmografia_brasileira")
+        assert entry["last_accessed"]
+
+    def test_prune_least_recently_used_datasets_after_download(
+        self, remote_dataset, monkeypatch
+    ):
+        stale_dir = get_cache_dir() / "base_antiga"
+        stale_dir.mkdir(parents=True)
+        (stale_dir / "base.parquet").write_bytes(b"0" * 1000)
+        update_entry(get_cache_dir(), "base_antiga", last_accessed="2000-01-01T00:00")
+        set_cache_max_size(1000)
+
+        try:
+            download_dataset("filmografia_brasileira")
+        finally:
+            set_cache_max_size(None)
+
+        assert [dataset["name"] for dataset in cache_info()] == [
+            "filmografia_brasileira"
+        ]  # kept even if it alone is above the limit
+        assert stale_dir.exists() is False
+
+    def test_refresh_and_offline_are_mutually_exclusive(self):
+        with pytest.raises(ValueError):
+            load_dataset("filmografia_brasileira", refresh=True, offline=True)
+
+
+class TestDatasetStats:
+    def test_local_dataset_stats(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CACIMBAO_CACHE_DIR", str(tmp_path / "cache"))
+        name = "salario_minimo_real_vigente"
+
+        stats = dataset_stats(name)
+
+        df = load_dataset(name)
+        assert stats["name"] == name
+        assert stats["rows"] == df.height
+        assert stats["columns"] == df.width
+        assert stats["row_groups"] == 1
+        assert stats["file_size"] > 0
+        assert stats["estimated_memory_size"] == df.estimated_size()
+        assert stats["schema"] == {
+            column: str(dtype) for column, dtype in df.schema.items()
+        }
+
+    def test_stats_are_cached_until_the_file_changes(self, remote_dataset, monkeypatch):
+        load_dataset("filmografia_brasileira")
+        stats = dataset_stats("filmografia_brasileira")
+        assert stats["rows"] == 2
+
+        def fail(filepath):
+            raise AssertionError("the footer should not be read again")
+
+        with monkeypatch.context() as m:
+            m.setattr(loaders, "parquet_footer_stats", fail)
+            assert dataset_stats("filmografia_brasileira") == stats
+
+        pl.DataFrame({"titulo": ["Cidade de Deus"] * 3}).write_parquet(stats["path"])
+        update_entry(
+            get_cache_dir(),
+            "filmografia_brasileira",
+            size=Path(stats["path"]).stat().st_size,
+        )
+
+        assert dataset_stats("filmografia_brasileira")["rows"] == 3
+
+    def test_estimate_the_memory_of_long_texts(self, remote_dataset):
+        path = Path(dataset_stats("filmografia_brasileira", download=True)["path"])
+        df = pl.DataFrame({"sinopse": [f"Filme {i}. " * 50 for i in range(1000)]})
+        df.write_parquet(path)
+        update_entry(
+            get_cache_dir(), "filmografia_brasileira", size=path.stat().st_size
+        )
+
+        stats = dataset_stats("filmografia_brasileira")
+
+        # not only the 16-byte views: the text is stored out of them
+        assert stats["estimated_memory_size"] >= df.estimated_size()
+
+    def test_remote_dataset_not_cached(self, remote_dataset):
+        assert dataset_stats("filmografia_brasileira") is None
+        assert remote_dataset.requests == []  # nothing was downloaded
+
+        stats = dataset_stats("filmografia_brasileira", download=True)
+
+        assert stats["rows"] == 2
+        assert stats["schema"] == {"titulo": "String"}
+
+    def test_datasets_manifest(self, remote_dataset):
+        manifest = datasets_manifest()
+
+        assert list(manifest) == list_datasets()
+        assert manifest["filmografia_brasileira"] is None
+        assert manifest["sinpatinhas"]["rows"] > 0
+
+        manifest = datasets_manifest(["filmografia_brasileira"], download=True)
+
+        assert manifest["filmografia_brasileira"]["rows"] == 2
+
+
+class TestVerifyDataset:
+    @pytest.mark.parametrize(
+        "name", [name for name in list_datasets() if get_dataset(name).local]
+    )
+    def test_packaged_datasets_are_intact(self, name):
+        assert verify_dataset(name) is True
+
+    def test_detect_corrupted_cached_dataset(self, remote_dataset):
+        load_dataset("filmografia_brasileira")
+        assert verify_dataset("filmografia_brasileira", use_mmap=True) is True
+
+        file_path = loaders._resolve_filepath("filmografia_brasileira", offline=True)
+        with open(file_path, "r+b") as f:
+            f.truncate(file_path.stat().st_size - 10)
+
+        assert verify_dataset("filmografia_brasileira") is False
+
+    def test_verify_remote_dataset_without_downloading(self, remote_dataset):
+        with pytest.raises(FileNotFoundError, match="não encontrada no cache"):
+            verify_dataset("filmografia_brasileira")
+        assert remote_dataset.requests == []
+
+    def test_verify_datasets(self, remote_dataset):
+        local_names = [name for name in list_datasets() if get_dataset(name).local]
+
+        assert verify_datasets() == {name: True for name in local_names}
+
+        load_dataset("filmografia_brasileira")
+
+        results = verify_datasets(max_workers=2)
+        assert results == {name: True for name in list_datasets() if name in results}
+        assert "filmografia_brasileira" in results
+
+    @pytest.fixture
+    def dataset_with_checksum(self, remote_dataset, tmp_path):
+        def serve(content_hash):
+            parquet_filepath = tmp_path / "filmografia.parquet"
+            datapackage = {
+                "path": "filmografia.parquet",
+                "bytes": parquet_filepath.stat().st_size,
+                "hash": content_hash or f"sha256:{file_sha256(parquet_filepath)}",
+            }
+            with zipfile.ZipFile(remote_dataset.dir / "filmografia.zip", "w") as zf:
+                zf.writestr("datapackage.json", json.dumps(datapackage))
+                zf.write(parquet_filepath, "filmografia.parquet")
+
+        return serve
+
+    def test_verify_checksum_on_download(self, dataset_with_checksum):
+        dataset_with_checksum(None)
+
+        df = download_dataset("filmografia_brasileira")
+
+        assert df.shape == (2, 1)
+        assert verify_dataset("filmografia_brasileira") is True
+
+    def test_hash_downloaded_file_once(self, dataset_with_checksum, monkeypatch):
+        from cacimbao import helpers
+
+        dataset_with_checksum(None)
+        hashed = []
+        file_hash = helpers.file_hash
+
+        def counting_file_hash(filepath, *args, **kwargs):
+            hashed.append(filepath)
+            return file_hash(filepath, *args, **kwargs)
+
+        monkeypatch.setattr(helpers, "file_hash", counting_file_hash)
+
+        download_dataset("filmografia_brasileira")
+
+        assert len(hashed) == 1
+
+    def test_reject_corrupted_download(self, dataset_with_checksum):
+        download_dataset("filmografia_brasileira")
+        dataset_with_checksum("sha256:" + "0" * 64)
+
+        with pytest.raises(ValueError, match="corrompido"):
+            download_dataset("filmografia_brasileira", refresh=True)
+
+        # the previous version is kept
+        assert download_dataset("filmografia_brasileira", offline=True).shape == (2, 1)
+        assert not (get_cache_dir() / ".filmografia_brasileira.download").exists()
+
+
+class TestPartitionedDataset:
+    @pytest.fixture
+    def partitioned_dataset(self, tmp_path, monkeypatch):
+        """Use a partitioned version of sinpatinhas, in a temporary directory."""
+        monkeypatch.setenv("CACIMBAO_CACHE_DIR", str(tmp_path / "cache"))
+        dataset_dir = tmp_path / "sinpatinhas"
+        dataset_dir.mkdir()
+        monkeypatch.setattr(
+            SinPatinhasDataset, "dir", classmethod(lambda cls: dataset_dir)
+        )
+        df = pl.DataFrame(
+            {
+                "especie": ["Gato", "Cão", "Cão", "Gato"],
+                "uf": ["BA", "BA", "SE", "PE"],
+                "idade": [1, 2, 3, 4],
+            }
+        )
+        monkeypatch.setattr(SinPatinhasDataset, "cluster_by", ("uf", "idade"))
+        output_dir = SinPatinhasDataset.write(df, partitioned=True)
+        datapackage = SinPatinhasDataset.create_datapackage_from_file(output_dir)
+        datapackage.rename(dataset_dir / "datapackage.json")
+        monkeypatch.setattr(SinPatinhasDataset, "filepath", Path(output_dir))
+        return Path(output_dir)
+
+    def test_load_partitioned_dataset(self, partitioned_dataset):
+        df = load_dataset("sinpatinhas")
+
+        assert df.columns == ["especie", "uf", "idade"]
+        assert sorted(df["idade"].to_list()) == [1, 2, 3, 4]
+
+    def test_filters_only_read_matching_partitions(self, partitioned_dataset):
+        df = load_dataset(
+            "sinpatinhas", filters={"uf": ["BA", "SE"]}, columns=["idade"]
+        )
+
+        assert sorted(df["idade"].to_list()) == [1, 2, 3]
+        plan = scan_dataset("sinpatinhas").filter(pl.col("uf") == "SE").explain()
+        assert "uf=SE" in plan
+        assert "uf=BA" not in plan
+
+    def test_partitioned_dataset_in_batches(self, partitioned_dataset):
+        batches = list(iter_batches("sinpatinhas", batch_size=3))
+
+        assert [batch.height for batch in batches] == [3, 1]
+
+    def test_stats_of_partitioned_dataset(self, partitioned_dataset):
+        stats = dataset_stats("sinpatinhas")
+
+        assert stats["rows"] == 4
+        assert stats["columns"] == 3
+        assert stats["row_groups"] == 3  # one file per state
+        assert stats["schema"] == {
+            "especie": "Categorical",  # low cardinality
+            "uf": "String",
+            "idade": "Int8",  # downcasted
+        }
+
+    def test_categories_survive_loading(self, partitioned_dataset):
+        df = load_dataset("sinpatinhas")
+
+        assert df.schema["especie"] == pl.Categorical
+
+    def test_categories_survive_loading_into_pandas(self, partitioned_dataset):
+        pytest.importorskip("pandas")
+        pytest.importorskip("pyarrow")
+
+        df = load_dataset("sinpatinhas", df_format="pandas")
+
+        assert df["especie"].dtype == "category"
+        assert list(df["especie"].cat.categories) == ["Cão", "Gato"]
+
+    def test_filter_categories(self, partitioned_dataset):
+        assert load_dataset("sinpatinhas", filters={"especie": "Gato"}).height == 2
+        # not a category of the column: no rows instead of an error
+        assert load_dataset("sinpatinhas", filters={"especie": "Papagaio"}).height == 0
+        filters = {"especie": ["Gato", "Papagaio"]}
+        assert load_dataset("sinpatinhas", filters=filters).height == 2
+
+    def test_compare_categories_with_any_string(self, partitioned_dataset):
+        lf = scan_dataset("sinpatinhas")
+        assert lf.filter(pl.col("especie") == "Papagaio").collect().height == 0
+        assert lf.filter(pl.col("especie") != "Papagaio").collect().height == 4
+
+        df = load_dataset("sinpatinhas")
+        assert df.filter(pl.col("especie").is_in(["Cão", "Papagaio"])).height == 2
+        other = pl.DataFrame(
+            {"especie": ["Papagaio"]}, schema=df.select("especie").schema
+        )
+        assert pl.concat([df.select("especie"), other]).height == 5
+
+    def test_verify_partitioned_dataset(self, partitioned_dataset):
+        assert verify_dataset("sinpatinhas") is True
+
+        part = partitioned_dataset / "uf=SE" / "00000000.parquet"
+        part.write_bytes(part.read_bytes()[:-1] + b"0")
+
+        assert verify_dataset("sinpatinhas") is False
+
+
+class TestConditionalRefresh:
+    def test_store_validators_from_server(self, remote_dataset):
+        download_dataset("filmografia_brasileira")
+
+        entry = get_entry(get_cache_dir(), "filmografia_brasileira")
+        assert entry["etag"]
+        assert entry["last_modified"]
+
+    def test_refresh_unchanged_dataset_costs_a_304(self, remote_dataset):
+        download_dataset("filmografia_brasileira")
+        entry = get_entry(get_cache_dir(), "filmografia_brasileira")
+
+        df = download_dataset("filmografia_brasileira", refresh=True)
+
+        assert df.shape == (2, 1)
+        assert remote_dataset.status_codes == [200, 304]
+        assert remote_dataset.requests[-1]["If-None-Match"] == entry["etag"]
+        assert (
+            remote_dataset.requests[-1]["If-Modified-Since"] == entry["last_modified"]
+        )
+
+    def test_refresh_changed_dataset_downloads_it_again(self, remote_dataset):
+        download_dataset("filmografia_brasileira")
+        with zipfile.ZipFile(remote_dataset.dir / "filmografia.zip", "w") as zf:
+            zf.writestr("datapackage.json", json.dumps({"path": "filmes.csv"}))
+            zf.writestr("filmes.csv", "titulo\nO Auto da Compadecida")
+
+        df = download_dataset("filmografia_brasileira", refresh=True)
+
+        assert df.shape == (1, 1)
+        assert remote_dataset.status_codes == [200, 200]
+        entry = get_entry(get_cache_dir(), "filmografia_brasileira")
+        assert entry["path"] == "filmes.csv"
+        assert not (
+            get_cache_dir() / "filmografia_brasileira" / "filmografia.parquet"
+        ).exists()  # the old version is replaced
+
+
+class TestDownloadDatasets:
+    def test_download_several_datasets(self, remote_dataset):
+        results = download_datasets(
+            ["filmografia_brasileira", "sinpatinhas"], max_workers=2
+        )
+
+        assert list(results) == ["filmografia_brasileira", "sinpatinhas"]
+        assert all(result.ok for result in results.values())
+        assert all(result.elapsed >= 0 for result in results.values())
+        assert all(result.dataframe is None for result in results.values())
+        assert get_entry(get_cache_dir(), "filmografia_brasileira")
+
+    def test_return_frames(self, remote_dataset):
+        results = download_datasets(
+            ["filmografia_brasileira", "salario_minimo_real_vigente"],
+            return_frames=True,
+        )
+
+        assert results["filmografia_brasileira"].dataframe.shape == (2, 1)
+        assert isinstance(
+            results["salario_minimo_real_vigente"].dataframe, pl.DataFrame
+        )
+
+    def test_failures_do_not_abort_other_datasets(self, remote_dataset):
+        (remote_dataset.dir / "filmografia.zip").unlink()
+
+        results = download_datasets(
+            ["filmografia_brasileira", "inexistente", "aldeias_indigenas"],
+            return_frames=True,
+        )
+
+        assert isinstance(results["filmografia_brasileira"].error, requests.HTTPError)
+        assert isinstance(results["inexistente"].error, ValueError)
+        assert results["aldeias_indigenas"].ok
+        assert results["aldeias_indigenas"].dataframe.shape[0] > 0
+
+    def test_concurrent_downloads_of_the_same_dataset(self, remote_dataset):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            frames = list(
+                executor.map(
+                    lambda columns: download_dataset(
+                        "filmografia_brasileira", columns=columns
+                    ),
+                    [None, ["titulo"]] * 2,
+                )
+            )
+
+        assert [df.shape for df in frames] == [(2, 1)] * 4
+        assert len(remote_dataset.requests) == 1
+
+    def test_download_all_datasets_by_default(self, monkeypatch):
+        monkeypatch.setattr(loaders, "_resolve_filepath", lambda *args: None)
+
+        results = download_datasets()
+
+        assert list(results) == list_datasets()
+
+
+class TestAsyncLoad:
+    def test_aload_dataset(self):
+        df = asyncio.run(aload_dataset("salario_minimo_real_vigente"))
+
+        assert df.equals(load_dataset("salario_minimo_real_vigente"))
+
+    def test_adownload_remote_dataset(self, remote_dataset):
+        df = asyncio.run(adownload_dataset("filmografia_brasileira"))
+
+        assert df.shape == (2, 1)
+
+    def test_concurrent_awaits_share_the_same_load(self, monkeypatch):
+        resolved, loaded = [], []
+        release = threading.Event()
+
+        def slow_resolve_filepath(name, *args):
+            resolved.append(name)
+            release.wait(timeout=5)
+            return Path(f"{name}.parquet")
+
+        def load_file(name, file_path, df_format, columns, filters):
+            loaded.append((name, columns))
+            return pl.DataFrame({"name": [name]})
+
+        monkeypatch.setattr(loaders, "_resolve_filepath", slow_resolve_filepath)
+        monkeypatch.setattr(loaders, "_load_file", load_file)
+
+        async def main():
+            loads = asyncio.gather(
+                *[aload_dataset("sinpatinhas") for _ in range(3)],
+                aload_dataset("sinpatinhas", columns=["uf"]),
+                aload_dataset("aldeias_indigenas"),
+            )
+            await asyncio.sleep(0.05)  # the event loop is not blocked meanwhile
+            release.set()
+            return await loads
+
+        results = asyncio.run(main())
+
+        # a single download per dataset, a single read per set of arguments
+        assert sorted(resolved) == ["aldeias_indigenas", "sinpatinhas"]
+        assert sorted(loaded, key=repr) == [
+            ("aldeias_indigenas", None),
+            ("sinpatinhas", None),
+            ("sinpatinhas", ["uf"]),
+        ]
+        assert [df["name"][0] for df in results] == ["sinpatinhas"] * 4 + [
+            "aldeias_indigenas"
+        ]
+        assert not any(loaders._pending_loads.values())
+
+    def test_concurrent_loads_of_a_remote_dataset(self, remote_dataset):
+        async def main():
+            return await asyncio.gather(
+                aload_dataset("filmografia_brasileira", columns=["titulo"]),
+                aload_dataset("filmografia_brasileira"),
+            )
+
+        results = asyncio.run(main())
+
+        assert [df.shape for df in results] == [(2, 1), (2, 1)]
+        assert len(remote_dataset.requests) == 1
+
+    def test_errors_are_raised_to_every_await(self):
+        async def main():
+            return await asyncio.gather(
+                aload_dataset("inexistente"),
+                aload_dataset("inexistente"),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(main())
+
+        assert all(isinstance(result, ValueError) for result in results)
+
+
+class TestMemoryCache:
+    @pytest.fixture(autouse=True)
+    def memory_cache(self):
+        enable_memory_cache()
+        yield
+        disable_memory_cache()
+
+    def test_disabled_by_default(self):
+        disable_memory_cache()
+
+        load_dataset("sinpatinhas")
+
+        assert memory_cache_info() is None
+
+    def test_reuse_loaded_dataset(self):
+        first = load_dataset("sinpatinhas")
+        second = load_dataset("sinpatinhas")
+
+        assert first.equals(second)
+        assert first is not second
+        info = memory_cache_info()
+        assert (info["hits"], info["misses"], info["entries"]) == (1, 1, 1)
+        assert info["size"] == first.estimated_size()
+
+    def test_returned_frames_do_not_affect_the_cache(self):
+        df = load_dataset("salario_minimo_real_vigente")
+        df.insert_column(0, pl.Series("new", [1] * df.height))  # in place
+
+        cached = load_dataset("salario_minimo_real_vigente")
+
+        assert "new" not in cached.columns
+
+    def test_evict_least_recently_used_by_size(self):
+        aldeias = load_dataset("aldeias_indigenas")
+        salario = load_dataset("salario_minimo_real_vigente")
+        enable_memory_cache(
+            max_size=aldeias.estimated_size() + salario.estimated_size()
+        )
+
+        load_dataset("aldeias_indigenas")
+        load_dataset("salario_minimo_real_vigente")
+        load_dataset("aldeias_indigenas")  # salario is now the least recently used
+        load_dataset("salario_minimo_real_vigente")
+        load_dataset("sinpatinhas")  # too big to be cached
+
+        info = memory_cache_info()
+        assert (info["hits"], info["misses"], info["entries"]) == (2, 3, 2)
+
+        enable_memory_cache(max_size=aldeias.estimated_size())
+        load_dataset("salario_minimo_real_vigente")
+        load_dataset("aldeias_indigenas")
+        load_dataset("salario_minimo_real_vigente")
+
+        info = memory_cache_info()
+        assert (info["hits"], info["misses"], info["entries"]) == (0, 3, 1)
+
+    def test_each_df_format_is_cached_separately(self):
+        pytest.importorskip("pandas")
+        load_dataset("salario_minimo_real_vigente")
+        first = load_dataset("salario_minimo_real_vigente", df_format="pandas")
+        first["Data"] = None
+        second = load_dataset("salario_minimo_real_vigente", df_format="pandas")
+
+        assert second["Data"].notna().all()
+        assert memory_cache_info()["entries"] == 2
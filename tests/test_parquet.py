@@ -0,0 +1,65 @@
+from datetime import date
+
+import polars as pl
+import pytest
+
+from cacimbao.parquet import parquet_footer_stats
+
+
+class TestParquetFooterStats:
+    def test_stats_match_the_data(self, tmp_path):
+        filepath = tmp_path / "dados.parquet"
+        df = pl.DataFrame(
+            {
+                "uf": ["BA", "SE", "PE"] * 1000,
+                "ano": list(range(3000)),
+                "data": [date(2025, 1, 1)] * 3000,
+                "valores": [[1.5, 2.5]] * 3000,
+                "ativo": [True, False, None] * 1000,
+            }
+        )
+        df.write_parquet(filepath, row_group_size=1000)
+
+        stats = parquet_footer_stats(filepath)
+
+        assert stats["rows"] == 3000
+        assert stats["columns"] == 5
+        assert stats["row_groups"] == 3
+        assert 0 < stats["compressed_size"] < filepath.stat().st_size
+        assert stats["uncompressed_size"] > 0
+        assert list(stats["column_sizes"]) == df.columns
+        assert sum(stats["column_sizes"].values()) == stats["uncompressed_size"]
+
+    def test_many_columns(self, tmp_path):
+        filepath = tmp_path / "largo.parquet"
+        pl.DataFrame({f"coluna_{i}": [i] for i in range(40)}).write_parquet(filepath)
+
+        stats = parquet_footer_stats(filepath)
+
+        assert (stats["rows"], stats["columns"], stats["row_groups"]) == (1, 40, 1)
+
+    def test_empty_file(self, tmp_path):
+        filepath = tmp_path / "vazio.parquet"
+        pl.DataFrame({"uf": []}, schema={"uf": pl.String}).write_parquet(filepath)
+
+        stats = parquet_footer_stats(filepath)
+
+        assert stats["rows"] == 0
+        assert stats["columns"] == 1
+
+    @pytest.mark.parametrize("content", [b"", b"uf,ano\nBA,2025\n", b"PAR1" * 10])
+    def test_invalid_file(self, tmp_path, content):
+        filepath = tmp_path / "invalido.parquet"
+        filepath.write_bytes(content)
+
+        with pytest.raises(ValueError, match="Arquivo parquet inválido"):
+            parquet_footer_stats(filepath)
+
+    def test_truncated_file(self, tmp_path):
+        filepath = tmp_path / "truncado.parquet"
+        pl.DataFrame({"uf": ["BA"] * 100}).write_parquet(filepath)
+        content = filepath.read_bytes()
+        filepath.write_bytes(content[:-40] + content[-8:])  # footer cut short
+
+        with pytest.raises(ValueError, match="Arquivo parquet inválido"):
+            parquet_footer_stats(filepath)